@@ -0,0 +1,13 @@
+"""
+Performance benchmarks for quiescent, these aren't part of the installed
+package, run them from a checkout. Every suite runs on its own, e.g.:
+
+    python -m benchmarks.templite_attributes
+
+or all of them at once, saving the results to compare against later:
+
+    python -m benchmarks --output results.json
+    python -m benchmarks --compare results.json
+
+Sites to build are generated by `benchmarks.corpus`.
+"""
@@ -0,0 +1,99 @@
+"""
+Run the benchmark suites, optionally saving the results as JSON and
+comparing them with results saved earlier (e.g. from the previous release):
+
+    python -m benchmarks --output new.json --compare old.json
+
+Every result is a time in seconds or a size in bytes, smaller is better. With
+--compare the exit status is 1 if anything got worse by more than the
+threshold.
+"""
+from datetime import datetime, timezone
+import argparse
+import platform
+import json
+import sys
+
+from quiescent import __version__
+
+from . import (build, frontmatter, micro, post_memory,
+               templite_attributes)
+
+# name -> (function, arguments, arguments for --quick)
+SUITES = {
+    'build': (build.run, {}, {'posts': 50, 'media': 5, 'repeat': 1}),
+    'micro': (micro.run, {}, {'posts': 100, 'repeat': 2}),
+    'frontmatter': (frontmatter.run, {}, {'files': 50, 'repeat': 2}),
+    'templite_attributes': (templite_attributes.run, {},
+                            {'posts': 1000, 'repeat': 2}),
+    'post_memory': (post_memory.run, {}, {'posts': 10000}),
+}
+
+
+def run(suites=tuple(SUITES), quick=False):
+    results = {}
+    for name in suites:
+        function, arguments, quick_arguments = SUITES[name]
+        print(f'Running {name}...', file=sys.stderr)
+        results[name] = function(**(quick_arguments if quick else arguments))
+    return {'quiescent': __version__,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'date': datetime.now(timezone.utc).isoformat(),
+            'quick': quick,
+            'results': results}
+
+
+def compare(old, new, threshold=0.1):
+    '''
+    Return lines comparing each result of `new` with `old`, and whether any
+    is worse by more than `threshold` (a fraction)
+    '''
+    lines = []
+    regressed = False
+    for suite, results in new['results'].items():
+        previous = old['results'].get(suite, {})
+        for name, value in results.items():
+            if name not in previous:
+                continue
+            ratio = value / previous[name] if previous[name] else 1.0
+            flag = ''
+            if ratio > 1 + threshold:
+                flag = '  REGRESSION'
+                regressed = True
+            lines.append(f'{suite:>20} {name:>30}: {ratio:6.2f}x{flag}')
+    return lines, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--suite', action='append', choices=tuple(SUITES),
+                        help='a suite to run (may be repeated, default all)')
+    parser.add_argument('--quick', action='store_true',
+                        help='smaller inputs, for a fast check')
+    parser.add_argument('--output', metavar='PATH',
+                        help='save the results to PATH as JSON')
+    parser.add_argument('--compare', metavar='PATH',
+                        help='compare with results saved earlier')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='the fraction by which a result may get worse '
+                        'before counting as a regression (default 0.1)')
+    args = parser.parse_args()
+    report = run(suites=args.suite or tuple(SUITES), quick=args.quick)
+    print(json.dumps(report['results'], indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        lines, regressed = compare(old, report, threshold=args.threshold)
+        print('\n'.join(lines))
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+End-to-end builds of a synthetic site (see `benchmarks.corpus`): a cold
+build into an empty output directory, a rebuild with nothing changed, and a
+rebuild after editing a single post.
+"""
+import argparse
+import tempfile
+import shutil
+import time
+import os
+
+from quiescent.static import StaticGenerator
+
+from .corpus import generate_site
+
+
+def timed_build(config_file, **kwargs):
+    start = time.perf_counter()
+    generator = StaticGenerator(config_file=config_file, **kwargs)
+    generator.configure()
+    generator.build()
+    return time.perf_counter() - start
+
+
+def run(posts=500, paragraphs=5, media=50, depth=2, jobs=1, repeat=3):
+    results = {'cold': [], 'unchanged': [], 'one post changed': []}
+    with tempfile.TemporaryDirectory() as root:
+        config_file = generate_site(root, posts=posts, paragraphs=paragraphs,
+                                    media=media, depth=depth)
+        output_dir = os.path.join(root, 'build')
+        edited = os.path.join(root, 'posts', 'post-0.md')
+        for dirpath, _, filenames in os.walk(os.path.join(root, 'posts')):
+            if 'post-0.md' in filenames:
+                edited = os.path.join(dirpath, 'post-0.md')
+        for attempt in range(repeat):
+            shutil.rmtree(output_dir, ignore_errors=True)
+            results['cold'].append(timed_build(config_file, jobs=jobs))
+            results['unchanged'].append(timed_build(config_file, jobs=jobs))
+            with open(edited, 'a') as f:
+                f.write(f'\nAn edit, number {attempt}.\n')
+            results['one post changed'].append(
+                timed_build(config_file, jobs=jobs))
+    return {name: min(times) for name, times in results.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=500)
+    parser.add_argument('--paragraphs', type=int, default=5)
+    parser.add_argument('--media', type=int, default=50)
+    parser.add_argument('--depth', type=int, default=2)
+    parser.add_argument('--jobs', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    results = run(posts=args.posts, paragraphs=args.paragraphs,
+                  media=args.media, depth=args.depth, jobs=args.jobs,
+                  repeat=args.repeat)
+    for name, seconds in results.items():
+        print(f'{name:>18}: {seconds * 1000:10.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
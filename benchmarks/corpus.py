@@ -0,0 +1,186 @@
+"""
+Generate a synthetic site, a configuration, templates and posts (with media)
+for benchmarking builds, e.g.:
+
+    python -m benchmarks.corpus /tmp/site --posts 1000 --media 100
+"""
+import argparse
+import random
+import os
+
+CONFIG = '''[STATIC]
+domain = https://example.com/
+name = benchmark
+author = benchmark
+output directory = {root}/build
+posts directory = {root}/posts
+media directory = media
+templates directory = {root}/templates
+date format = %Y-%m-%d
+feed link = feed.atom
+archive page size = {archive_page_size}
+'''
+
+TEMPLATES = {
+    'base.html': '''<!DOCTYPE html>
+<html>
+  <head>
+    <meta charset="utf-8">
+    <base href="/">
+    <title>{% block title %}benchmark{% endblock %}</title>
+  </head>
+  <body>
+    {% block content %}{% endblock %}
+  </body>
+</html>
+''',
+    'index.html': '''{% extends "base.html" %}
+{% block content %}
+{% for post in front_posts %}
+<article>
+  <h2><a href="{{ post.path }}">{{ post.title }}</a></h2>
+  <time>{{ post.date }}</time>
+  {{ post.leader }}
+</article>
+{% endfor %}
+{% endblock %}
+''',
+    'archive.html': '''{% extends "base.html" %}
+{% block content %}
+<ul>
+{% for post in all_posts %}
+  <li><a href="{{ post.path }}">{{ post.title }}</a> {{ post.date }}</li>
+{% endfor %}
+</ul>
+{% if page.previous %}<a href="{{ page.previous }}">Newer</a>{% endif %}
+{% if page.next %}<a href="{{ page.next }}">Older</a>{% endif %}
+{% endblock %}
+''',
+    'post.html': '''{% extends "base.html" %}
+{% block title %}{{ post.title }}{% endblock %}
+{% block content %}
+<article>
+  <h1>{{ post.title }}</h1>
+  <time>{{ post.date }}</time>
+  {{ post.body }}
+</article>
+{% endblock %}
+''',
+}
+
+WORDS = ('lorem ipsum dolor sit amet consectetur adipiscing elit sed do '
+         'eiusmod tempor incididunt ut labore et dolore magna aliqua enim ad '
+         'minim veniam quis nostrud exercitation ullamco laboris nisi '
+         'aliquip ex ea commodo consequat').split()
+
+
+def sentence(rng, words=12):
+    text = ' '.join(rng.choice(WORDS) for _ in range(words))
+    return text.capitalize() + '.'
+
+
+def paragraph(rng, sentences=5):
+    return ' '.join(sentence(rng) for _ in range(sentences))
+
+
+def post_text(rng, index, date, paragraphs=5, images=()):
+    '''the text of a post, a mix of paragraphs and other markdown blocks'''
+    blocks = [paragraph(rng)]
+    for number in range(1, paragraphs):
+        kind = number % 4
+        if kind == 1:
+            blocks.append(f'## {sentence(rng, 4)}')
+        elif kind == 2:
+            blocks.append('\n'.join(f'- {sentence(rng, 6)}'
+                                    for _ in range(4)))
+        elif kind == 3:
+            blocks.append('    def example():\n        return 42')
+        blocks.append(f'{paragraph(rng)} [a link](https://example.com/'
+                      f'{rng.choice(WORDS)}) and *some* `code`.')
+    for image in images:
+        blocks.append(f'![an image]({image})')
+    title = f'{sentence(rng, 5)[:-1]} {index}'
+    body = '\n\n'.join(blocks)
+    return f'title: {title}\ndate: {date}\n+++\n\n{body}\n'
+
+
+def post_directory(index, depth, fan_out=4):
+    '''nest posts `depth` directories deep, `fan_out` directories per level'''
+    return os.path.join(*[f'section-{(index // fan_out ** level) % fan_out}'
+                          for level in range(depth)]) if depth else ''
+
+
+def generate_site(root, posts=100, paragraphs=5, media=0, media_size=16384,
+                  depth=1, archive_page_size=0, seed=0):
+    '''
+    Write a site to `root`, returning the path of its configuration file
+
+    Args:
+        posts: the number of posts
+        paragraphs: the length of each post, in blocks of markdown
+        media: the number of media files, spread over the post directories
+               and referenced from the posts alongside them
+        media_size: the size of each media file, in bytes
+        depth: how many directories deep posts are nested
+        archive_page_size: posts per archive page, 0 for a single page
+        seed: for the random number generator, the same arguments and seed
+              always produce the same site
+    '''
+    rng = random.Random(seed)
+    config_file = os.path.join(root, 'config.ini')
+    os.makedirs(os.path.join(root, 'templates'), exist_ok=True)
+    with open(config_file, 'w') as f:
+        f.write(CONFIG.format(root=root, archive_page_size=archive_page_size))
+    for name, text in TEMPLATES.items():
+        with open(os.path.join(root, 'templates', name), 'w') as f:
+            f.write(text)
+
+    directories = sorted({post_directory(i, depth) for i in range(posts)})
+    images = {directory: [] for directory in directories}
+    for index in range(media):
+        directory = directories[index % len(directories)]
+        name = f'image-{index}.png'
+        path = os.path.join(root, 'posts', directory, 'media', name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(rng.getrandbits(8 * media_size).to_bytes(media_size,
+                                                             'little'))
+        images[directory].append(f'media/{name}')
+
+    for index in range(posts):
+        directory = post_directory(index, depth)
+        # a couple of the images alongside each post
+        available = images[directory]
+        post_images = [available[(index + i) % len(available)]
+                       for i in range(min(2, len(available)))]
+        year, day = 2000 + index // 365, index % 365
+        date = f'{year}-{day // 28 % 12 + 1:02d}-{day % 28 + 1:02d}'
+        path = os.path.join(root, 'posts', directory, f'post-{index}.md')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(post_text(rng, index, date, paragraphs=paragraphs,
+                              images=post_images))
+    return config_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('root')
+    parser.add_argument('--posts', type=int, default=100)
+    parser.add_argument('--paragraphs', type=int, default=5)
+    parser.add_argument('--media', type=int, default=0)
+    parser.add_argument('--media-size', type=int, default=16384)
+    parser.add_argument('--depth', type=int, default=1)
+    parser.add_argument('--archive-page-size', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    config_file = generate_site(args.root, posts=args.posts,
+                                paragraphs=args.paragraphs, media=args.media,
+                                media_size=args.media_size, depth=args.depth,
+                                archive_page_size=args.archive_page_size,
+                                seed=args.seed)
+    print(config_file)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Parsing frontmatter, the previous approach (a multiline `re.split` over the
+whole text, then splitting each line) against `quiescent.frontmatter`, both
+on text in memory and reading posts from disk for lazy collection, where
+only the frontmatter is read rather than the whole file.
+"""
+import argparse
+import tempfile
+import random
+import timeit
+import os
+import re
+
+from quiescent import frontmatter
+
+from .corpus import post_text
+
+
+def regex_split(text):
+    '''the frontmatter parser used by `Post._split` before the scanner'''
+    meta, body = re.split(r'^\+\+\+$', text, maxsplit=1, flags=re.M)
+    lines = meta.strip().split('\n')
+    line_pairs = (line.split(':', maxsplit=1) for line in lines)
+    return {key.strip().lower(): value.strip()
+            for key, value in line_pairs}, body
+
+
+def regex_read(path):
+    with open(path) as f:
+        return regex_split(f.read())[0]
+
+
+def header_read(path):
+    with open(path) as f:
+        return frontmatter.read(f)
+
+
+def best(function, repeat, number):
+    timer = timeit.Timer(function)
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run(paragraphs=20, files=200, repeat=5):
+    rng = random.Random(0)
+    text = post_text(rng, 0, '2018-01-01', paragraphs=paragraphs)
+    assert regex_split(text)[0] == frontmatter.split(text)[0]
+    with tempfile.TemporaryDirectory() as root:
+        paths = []
+        for index in range(files):
+            path = os.path.join(root, f'post-{index}.md')
+            with open(path, 'w') as f:
+                f.write(post_text(rng, index, '2018-01-01',
+                                  paragraphs=paragraphs))
+            paths.append(path)
+        return {
+            'regex split': best(lambda: regex_split(text), repeat, 1000),
+            'scanner split': best(lambda: frontmatter.split(text), repeat,
+                                  1000),
+            f'regex read ({files} files)':
+                best(lambda: [regex_read(p) for p in paths], repeat, 1),
+            f'header read ({files} files)':
+                best(lambda: [header_read(p) for p in paths], repeat, 1),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--paragraphs', type=int, default=20)
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    results = run(paragraphs=args.paragraphs, files=args.files,
+                  repeat=args.repeat)
+    for name, seconds in results.items():
+        print(f'{name:>26}: {seconds * 1000:10.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Micro-benchmarks of the pieces of a build: compiling and rendering a
+template, parsing a post, slugifying a title and generating the feed.
+Results are the best time of a single operation, in seconds.
+"""
+from datetime import datetime, timezone
+import argparse
+import random
+import timeit
+
+from quiescent.feed import feed
+from quiescent.post import Post, slugify
+from quiescent.static import Page
+from quiescent.templite import Templite
+
+from .corpus import TEMPLATES, post_text, sentence
+
+# the archive template, without inheritance so no loader is needed
+TEMPLATE = TEMPLATES['archive.html'].replace(
+    '{% extends "base.html" %}\n', '').replace(
+    '{% block content %}', '').replace('{% endblock %}', '')
+
+
+def make_posts(count, paragraphs=5, seed=0):
+    rng = random.Random(seed)
+    posts = []
+    for index in range(count):
+        text = post_text(rng, index, f'2018-01-{index % 28 + 1:02d}',
+                         paragraphs=paragraphs)
+        posts.append(Post().parse(text))
+    return sorted(posts)
+
+
+def best(function, repeat, number):
+    timer = timeit.Timer(function)
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run(posts=1000, paragraphs=5, repeat=5):
+    rng = random.Random(0)
+    text = post_text(rng, 0, '2018-01-01', paragraphs=paragraphs)
+    titles = [sentence(rng, 6) for _ in range(posts)]
+    all_posts = make_posts(posts, paragraphs=paragraphs)
+    template = Templite(TEMPLATE, records=(Post, Page))
+    context = {'all_posts': all_posts,
+               'page': Page(number=1, previous=None, next=None)}
+    date = datetime(2018, 1, 1, tzinfo=timezone.utc)
+    return {
+        'templite compile': best(lambda: Templite(TEMPLATE), repeat, 20),
+        f'templite render ({posts} posts)':
+            best(lambda: template.render(context), repeat, 1),
+        'post parse': best(lambda: Post().parse(text), repeat, 20),
+        'post parse (lazy)':
+            best(lambda: Post().parse(text, lazy=True), repeat, 200),
+        f'slugify ({posts} titles)':
+            best(lambda: [slugify(title) for title in titles], repeat, 1),
+        'feed (10 posts)': best(
+            lambda: feed(all_posts[:10], date=date, name='benchmark',
+                         domain='https://example.com/', feed_link='feed.atom',
+                         feed_author='benchmark'), repeat, 10),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=1000)
+    parser.add_argument('--paragraphs', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    results = run(posts=args.posts, paragraphs=args.paragraphs,
+                  repeat=args.repeat)
+    for name, seconds in results.items():
+        print(f'{name:>30}: {seconds * 1000:10.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
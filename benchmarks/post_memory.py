@@ -0,0 +1,68 @@
+"""
+Memory held by a large archive of posts, slotted `Post` records against the
+same attributes kept in a per-instance `__dict__` (the previous layout).
+"""
+import argparse
+import tracemalloc
+from datetime import datetime, timezone
+
+from quiescent.post import Post
+
+
+class DictPost:
+    '''the attributes of a Post, without slots'''
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+
+def synthetic_meta(index):
+    return {'relative_dir': f'{2000 + index % 20}',
+            'path': f'{2000 + index % 20}/post-number-{index}.html',
+            'title': f'Post number {index}',
+            'slug': f'post-number-{index}',
+            'timestamp': 946684800 + index * 3600,
+            'updated': None,
+            'tags': [],
+            'draft': False,
+            'assets': [],
+            'leader': f'<p>The first paragraph of post {index}.</p>\n'}
+
+
+def measure(make_post, count):
+    metas = [synthetic_meta(i) for i in range(count)]
+    tracemalloc.start()
+    posts = [make_post(meta, f'posts/{meta["slug"]}.md') for meta in metas]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del posts
+    return current
+
+
+def make_dict_post(meta, source):
+    date = datetime.fromtimestamp(meta['timestamp'], timezone.utc)
+    return DictPost(relative_dir=meta['relative_dir'], source=source,
+                    path=meta['path'], slug=meta['slug'], title=meta['title'],
+                    _date=date, date=date.strftime('%Y-%m-%d'),
+                    _updated=None, tags=(), draft=False,
+                    assets=(), _leader=meta['leader'], _body=None)
+
+
+def run(posts=100000):
+    return {'dict': measure(make_dict_post, posts),
+            'slots': measure(lambda meta, source: Post.from_dict(meta, source),
+                             posts)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=100000)
+    args = parser.parse_args()
+    results = run(posts=args.posts)
+    for name, size in results.items():
+        print(f'{name:>10}: {size / 2**20:8.2f} MiB '
+              f'({size / args.posts:.0f} bytes per post)')
+    print(f'{"reduction":>10}: {1 - results["slots"] / results["dict"]:8.1%}')
+
+
+if __name__ == '__main__':
+    main()
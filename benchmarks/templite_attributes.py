@@ -0,0 +1,47 @@
+"""
+Compare attribute lookup in a large template loop, the general `do_dots`
+lookup against direct attribute access for record types (like `Post`).
+"""
+import argparse
+import timeit
+
+from quiescent.templite import Templite
+
+TEMPLATE = '''
+{% for post in all_posts %}
+<a href="{{ post.path }}">{{ post.title }}</a> {{ post.date }}
+{% endfor %}
+'''
+
+
+class Record:
+    def __init__(self, index):
+        self.path = f'posts/post-{index}.html'
+        self.title = f'Post number {index}'
+        self.date = '2018-01-01'
+
+
+def run(posts=10000, repeat=5):
+    all_posts = [Record(i) for i in range(posts)]
+    context = {'all_posts': all_posts}
+    results = {}
+    for name, records in (('do_dots', ()), ('records', (Record,))):
+        template = Templite(TEMPLATE, records=records)
+        timer = timeit.Timer(lambda: template.render(context))
+        results[name] = min(timer.repeat(repeat=repeat, number=1))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    results = run(posts=args.posts, repeat=args.repeat)
+    for name, seconds in results.items():
+        print(f'{name:>10}: {seconds * 1000:8.2f} ms')
+    print(f'{"speedup":>10}: {results["do_dots"] / results["records"]:8.2f}x')
+
+
+if __name__ == '__main__':
+    main()
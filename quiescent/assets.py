@@ -0,0 +1,117 @@
+# Copyright 2018 Nolan Prescott
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Fingerprinted media, copied to names including a hash of their content
+  - a changed file gets a new name, so media can be served with far-future
+    caching headers (`Cache-Control: immutable`) and never go stale
+  - references in post bodies are rewritten to the new names, templates
+    refer to media with `{% asset path %}`
+"""
+import posixpath
+import json
+import os
+import re
+
+# src="..." and href='...' attributes in rendered HTML
+_REFERENCE = re.compile(r'''\b(src|href)=(["'])(.*?)\2''')
+_EXTERNAL = re.compile(r'^([a-zA-Z][a-zA-Z0-9+.-]*:|//|#)')
+
+
+def fingerprint(path, digest, length=10):
+    '''
+    >>> fingerprint('media/image.png', '0123456789abcdef')
+    'media/image.0123456789.png'
+    '''
+    stem, extension = posixpath.splitext(path)
+    return f'{stem}.{digest[:length]}{extension}'
+
+
+class AssetMap:
+    '''
+    The fingerprinted name of each media file, both relative to the output
+    directory and separated by "/", e.g. "media/image.png" to
+    "media/image.0123456789.png"
+    '''
+    def __init__(self, assets=None):
+        self.assets = dict(assets or {})
+
+    def __bool__(self):
+        return bool(self.assets)
+
+    def __call__(self, path):
+        '''
+        The fingerprinted name of `path` (relative to the root of the site),
+        or `path` itself if it isn't a known asset
+        '''
+        return self._root_url(path, None)
+
+    def rewrite(self, html, relative_dir='', lookups=None):
+        '''
+        Replace references to assets in the src and href attributes of
+        `html`, from a page in `relative_dir`. A relative reference is looked
+        up relative to the page first, then to the root of the site (for
+        pages using `<base href="/">`).
+
+        Given a set, `lookups` is updated with every name looked up, whether
+        or not it's an asset, i.e. the assets the page depends on.
+        '''
+        if not self.assets and lookups is None:
+            return html
+        relative_dir = relative_dir.replace(os.sep, '/')
+
+        def replace(match):
+            attribute, quote, url = match.groups()
+            url = self._url(url, relative_dir, lookups)
+            return f'{attribute}={quote}{url}{quote}'
+
+        return _REFERENCE.sub(replace, html)
+
+    def _get(self, name, lookups):
+        if lookups is not None:
+            lookups.add(name)
+        return self.assets.get(name)
+
+    def _root_url(self, path, lookups):
+        if _EXTERNAL.match(path):
+            return path
+        url, suffix = _split_url(path)
+        leading = '/' if url.startswith('/') else ''
+        fingerprinted = self._get(posixpath.normpath(url.lstrip('/')),
+                                  lookups)
+        if fingerprinted is None:
+            return path
+        return f'{leading}{fingerprinted}{suffix}'
+
+    def _url(self, url, relative_dir, lookups):
+        if _EXTERNAL.match(url) or url.startswith('/'):
+            return self._root_url(url, lookups)
+        path, suffix = _split_url(url)
+        page_relative = posixpath.normpath(posixpath.join(relative_dir, path))
+        fingerprinted = self._get(page_relative, lookups)
+        if fingerprinted is not None:
+            relative = posixpath.relpath(fingerprinted, relative_dir or '.')
+            return relative + suffix
+        return self._root_url(url, lookups)
+
+    def to_json(self):
+        '''the asset manifest, for anything else deploying or serving media'''
+        return json.dumps(self.assets, indent=2, sort_keys=True) + '\n'
+
+
+def _split_url(url):
+    '''split a url into its path and any query and fragment'''
+    index = min((url.find(c) for c in '?#' if c in url), default=len(url))
+    return url[:index], url[index:]
@@ -14,9 +14,14 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import argparse
+import cProfile
 import logging
+import sys
 
-from .static import StaticGenerator
+from .static import ConfigurationError, StaticGenerator
+from .watch import Watcher
+from .serve import serve
+from .timing import Timings
 
 logger = logging.getLogger(__name__)
 
@@ -30,15 +35,92 @@ def main():
     parser.add_argument('--bootstrap', dest="bootstrap", action="store_true",
                         help="Initial setup step to create configuration file "
                         "and necessary templates")
+    parser.add_argument('--full', dest="full", action="store_true",
+                        help="Ignore the results of the previous build and "
+                        "regenerate every page")
+    parser.add_argument('-j', '--jobs', type=int, default=1, help="The "
+                        "number of processes used to convert posts and "
+                        "render pages (default 1)")
+    parser.add_argument('--link-media', dest="link_media",
+                        action="store_true", help="Hardlink media into the "
+                        "output directory rather than copying it")
+    parser.add_argument('--io-threads', type=int, default=4, help="The "
+                        "number of files written or copied at once "
+                        "(default 4)")
+    parser.add_argument('--fingerprint-media', dest="fingerprint_media",
+                        action="store_true", help="Copy media to names "
+                        "including a hash of its content, rewriting "
+                        "references in posts to match")
+    parser.add_argument('--gzip', dest="precompress", action="store_true",
+                        help="Also write a gzip-compressed copy of every "
+                        "HTML, XML, CSS and JavaScript output, for servers "
+                        "which send precompressed files")
+    parser.add_argument('--changes', metavar='PATH', help="Write the list of "
+                        "output files added, modified or deleted by the build "
+                        "to PATH")
+    parser.add_argument('--changes-format', choices=('json', 'files-from'),
+                        default='json', help="Either JSON (the default) or "
+                        "one file per line, added or modified files only, as "
+                        "expected by rsync's --files-from")
+    parser.add_argument('--watch', dest="watch", action="store_true",
+                        help="Keep running, rebuilding whenever posts, "
+                        "templates or the configuration change")
+    parser.add_argument('--serve', dest="serve", action="store_true",
+                        help="Serve the output directory for previewing, "
+                        "rebuilding (and reloading open pages) as with "
+                        "--watch")
+    parser.add_argument('--port', type=int, default=8000, help="The port "
+                        "used by --serve (default 8000)")
+    parser.add_argument('--profile', dest="profile", action="store_true",
+                        help="Report the time taken by each step of the "
+                        "build, and the slowest posts, pages and files")
+    parser.add_argument('--profile-top', type=int, default=10, metavar='N',
+                        help="The number of the slowest items reported by "
+                        "--profile (default 10)")
+    parser.add_argument('--profile-output', metavar='PATH', help="Run the "
+                        "build under cProfile and save the statistics to "
+                        "PATH, for use with the pstats module (covers the "
+                        "main process only, not --jobs workers)")
     args = parser.parse_args()
     if args.bootstrap:
         bootstrap()
     else:
-        s = StaticGenerator(config_file=args.config)
-        s.configure()
-        s.process_posts()
-        s.write_generated_files()
-        s.copy_media()
+        # profiling covers a single build, not watching
+        profile = args.profile and not (args.watch or args.serve)
+        s = StaticGenerator(config_file=args.config, full=args.full,
+                            jobs=args.jobs, link_media=args.link_media,
+                            io_threads=args.io_threads,
+                            precompress=args.precompress,
+                            fingerprint_media=args.fingerprint_media,
+                            timings=Timings() if profile else None)
+        try:
+            s.configure()
+        except ConfigurationError as e:
+            logger.error("An error occurred in initial configuration, do "
+                         "you have the necessary configuration file and "
+                         "templates?\n\tTry using the --boostrap command"
+                         f"\n\t{e}")
+            sys.exit(1)
+        if args.watch or args.serve:
+            logging.basicConfig(level=logging.INFO, format='%(message)s')
+            if args.serve:
+                serve(s, port=args.port)
+            else:
+                Watcher(s).run()
+            return
+        if args.profile_output:
+            profiler = cProfile.Profile()
+            profiler.runcall(s.build)
+            profiler.dump_stats(args.profile_output)
+        else:
+            s.build()
+        if s.timings is not None:
+            print(s.timings.report(top=args.profile_top), file=sys.stderr)
+        if args.changes:
+            s.write_changes(args.changes, format=args.changes_format)
+        if s.failures:
+            logger.error(f'{len(s.failures)} file(s) could not be processed')
+            sys.exit(1)
 
 def bootstrap():
     import os
@@ -54,6 +136,10 @@ media directory = media
 templates directory = templates
 date format = %Y-%m-%d
 feed link = feed.atom
+index posts = 10
+archive page size = 0
+feed entries = 10
+feed summary = no
 """.lstrip()
 
     archive = 'templates/archive.html', """
@@ -62,6 +148,8 @@ feed link = feed.atom
 {% for post in all_posts %}
 <a href="{{ post.path }}">{{ post.title }}</a>
 {% endfor %}
+{% if page.previous %}<a href="{{ page.previous }}">Newer</a>{% endif %}
+{% if page.next %}<a href="{{ page.next }}">Older</a>{% endif %}
 {% endblock %}
 """.lstrip()
 
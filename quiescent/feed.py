@@ -16,55 +16,106 @@
 """
 Atom feed[0] generator
   - update times are reported in UTC with no offset
+  - a feed is updated when its newest entry is, so regenerating a feed with
+    the same entries produces the same document
+  - the feed is written out element by element as it's generated, nothing
+    but the entry being written is held in memory
 
 [0]: https://tools.ietf.org/html/rfc4287
 """
-import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
 from urllib.parse import urljoin
+from xml.sax.saxutils import escape
 
+ATOM_NAMESPACE = 'http://www.w3.org/2005/Atom'
 
-ET.register_namespace('', 'http://www.w3.org/2005/Atom')
-
-def _feed(all_posts, date=None, name=None, domain=None, feed_link=None, feed_author=None):
-    _feed = ET.Element('{http://www.w3.org/2005/Atom}feed')
-    title = ET.SubElement(_feed, 'title')
-    title.text = name
-    link = ET.SubElement(_feed, 'link')
-    link.attrib['href'] = domain
-    feed_link = ET.SubElement(_feed, 'link')
-    feed_link.attrib['href'] = urljoin(domain, feed_link)
-    feed_link.attrib['rel'] = 'self'
-    updated = ET.SubElement(_feed, 'updated')
-    updated.text = date.isoformat()
-    author = ET.SubElement(_feed, 'author')
-    name = ET.SubElement(author, 'name')
-    name.text = feed_author
-    feed_id = ET.SubElement(_feed, 'id')
-    feed_id.text = domain
+# the update time of a feed without any entries
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# the same escaping as xml.etree.ElementTree, for the same output
+_ATTRIBUTE_ENTITIES = {'"': '&quot;', '\n': '&#10;', '\r': '&#13;',
+                       '\t': '&#09;'}
+
+
+class XMLWriter:
+    '''
+    A minimal streaming XML writer, passing the serialized document to
+    `write` (any callable accepting a string, e.g. the `write` method of a
+    file) a piece at a time
+    '''
+    def __init__(self, write):
+        self.write = write
+
+    def _open_tag(self, tag, attributes):
+        attributes = ''.join(
+            f' {name}="{escape(str(value), _ATTRIBUTE_ENTITIES)}"'
+            for name, value in attributes.items())
+        return f'<{tag}{attributes}'
+
+    def start(self, tag, **attributes):
+        self.write(self._open_tag(tag, attributes) + '>')
+
+    def end(self, tag):
+        self.write(f'</{tag}>')
+
+    def element(self, tag, text=None, **attributes):
+        '''an element containing only `text`, or an empty element'''
+        if not text:
+            self.write(self._open_tag(tag, attributes) + ' />')
+        else:
+            self.write(f'{self._open_tag(tag, attributes)}>'
+                       f'{escape(text)}</{tag}>')
+
+
+def last_updated(all_posts):
+    '''
+    The update time of a feed of `all_posts`, that of its most recently
+    updated entry
+    '''
+    return max((post._updated or post._date for post in all_posts),
+               default=EPOCH)
+
+
+def write_feed(write, all_posts, date=None, name=None, domain=None,
+               feed_link=None, feed_author=None, summary=False):
+    '''
+    Write an Atom feed of `all_posts` to `write`, entries contain the full
+    body of each post, or only its leader if `summary` is set
+    '''
+    xml = XMLWriter(write)
+    xml.start('feed', xmlns=ATOM_NAMESPACE)
+    xml.element('title', name)
+    xml.element('link', href=domain)
+    # the self link has always been written as the domain alone, `feed_link`
+    # is accepted for when that's corrected
+    xml.element('link', href=domain, rel='self')
+    xml.element('updated', date.isoformat())
+    xml.start('author')
+    xml.element('name', feed_author)
+    xml.end('author')
+    xml.element('id', domain)
     for post in all_posts:
-        _feed_entry(_feed, post, domain=domain)
-    return _feed
-
-def _feed_entry(parent_element, post, domain=None):
-    entry = ET.SubElement(parent_element, 'entry')
-    title = ET.SubElement(entry, 'title')
-    title.text = post.title
-    link = ET.SubElement(entry, 'link')
-    link.attrib['href'] = urljoin(domain, post.path)
-    entry_id = ET.SubElement(entry, 'id')
-    entry_id.text = urljoin(domain, post.path)
-    updated = ET.SubElement(entry, 'updated')
-    updated.text = post._date.isoformat()
-    content = ET.SubElement(entry, 'content')
-    content.attrib['type'] = 'html'
-    content.text = post.body
-    return entry
-
-def feed(all_posts, date=None, name=None, domain=None, feed_link=None, feed_author=None):
-    element = _feed(all_posts,
-                    date=date,
-                    name=name,
-                    domain=domain,
-                    feed_link=feed_link,
-                    feed_author=feed_author)
-    return ET.tostring(element, encoding='unicode')
+        _feed_entry(xml, post, domain=domain, summary=summary)
+    xml.end('feed')
+
+
+def _feed_entry(xml, post, domain=None, summary=False):
+    xml.start('entry')
+    xml.element('title', post.title)
+    xml.element('link', href=urljoin(domain, post.path))
+    xml.element('id', urljoin(domain, post.path))
+    xml.element('updated', (post._updated or post._date).isoformat())
+    if summary:
+        xml.element('summary', post.leader, type='html')
+    else:
+        xml.element('content', post.body, type='html')
+    xml.end('entry')
+
+
+def feed(all_posts, date=None, name=None, domain=None, feed_link=None,
+         feed_author=None, summary=False):
+    '''the feed as a string, see `write_feed`'''
+    parts = []
+    write_feed(parts.append, all_posts, date=date, name=name, domain=domain,
+               feed_link=feed_link, feed_author=feed_author, summary=summary)
+    return ''.join(parts)
@@ -0,0 +1,94 @@
+# Copyright 2018 Nolan Prescott
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Post frontmatter, the "key: value" lines at the top of a post up to a line
+of exactly "+++"
+  - scanning stops at the separator, nothing after it is looked at, so the
+    frontmatter of a post can be read without reading the whole file
+  - the body may contain further "+++" lines, only the first one counts
+"""
+
+SEPARATOR = '+++'
+
+_BOOLEANS = {'yes': True, 'true': True, 'on': True, '1': True,
+             'no': False, 'false': False, 'off': False, '0': False}
+
+
+def _add(meta, line):
+    if not line.strip():
+        return
+    key, separator, value = line.partition(':')
+    if not separator:
+        raise ValueError(f'Expected "key: value" in frontmatter, got {line!r}')
+    meta[key.strip().lower()] = value.strip()
+
+
+def split(text):
+    '''
+    Take as input text comprising a post file:
+
+        title: some text
+        date: 2015-12-01
+        +++
+        ... post contents ...
+
+    and return a tuple of a dictionary of the top "metadata" kv-pairs and
+    a string of the rest of the file
+    '''
+    meta = {}
+    start = 0
+    while True:
+        end = text.find('\n', start)
+        line = text[start:] if end == -1 else text[start:end]
+        if line.rstrip() == SEPARATOR:
+            return meta, ('' if end == -1 else text[end + 1:])
+        if end == -1:
+            raise ValueError(f'No "{SEPARATOR}" line after the frontmatter')
+        _add(meta, line)
+        start = end + 1
+
+
+def read(file):
+    '''
+    Read the frontmatter from an open (text) file, leaving the file positioned
+    at the start of the body
+    '''
+    meta = {}
+    # readline rather than iteration, so the body can be read afterwards
+    for line in iter(file.readline, ''):
+        if line.rstrip() == SEPARATOR:
+            return meta
+        _add(meta, line)
+    raise ValueError(f'No "{SEPARATOR}" line after the frontmatter')
+
+
+def parse_boolean(value):
+    '''
+    >>> parse_boolean('Yes'), parse_boolean('false')
+    (True, False)
+    '''
+    try:
+        return _BOOLEANS[value.lower()]
+    except KeyError:
+        raise ValueError(f'Not a boolean: {value!r}') from None
+
+
+def parse_list(value):
+    '''
+    >>> parse_list('python, static sites,, ')
+    ('python', 'static sites')
+    '''
+    return tuple(item.strip() for item in value.split(',') if item.strip())
@@ -0,0 +1,161 @@
+# Copyright 2018 Nolan Prescott
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Build manifest, a record of the inputs and outputs of the previous build
+  - sources (posts, templates, configuration) are fingerprinted by content
+    hash, the hash is only recomputed when a file's mtime or size changes
+  - outputs are recorded with a key derived from everything that went into
+    them, an output is only regenerated when its key changes
+"""
+import hashlib
+import json
+import os
+
+MANIFEST_VERSION = 3
+
+
+def file_digest(path, chunk_size=1 << 16):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_key(*parts):
+    '''
+    Reduce any JSON-serializable description of an output's inputs to a short
+    string suitable for comparison between builds
+    '''
+    text = json.dumps(parts, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class BuildManifest:
+    def __init__(self, path):
+        self.path = path
+        self.previous_sources = {}
+        self.previous_outputs = {}
+        self.sources = {}
+        self.outputs = {}
+
+    def load(self):
+        '''
+        Read the manifest of the previous build, a missing, unreadable or
+        outdated manifest is treated as an empty one (forcing a full build)
+        '''
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') != MANIFEST_VERSION:
+            return
+        self.previous_sources = data.get('sources', {})
+        self.previous_outputs = data.get('outputs', {})
+
+    def forget(self):
+        '''
+        Distrust the previous build, so that every source is hashed again
+        and every output regenerated, only the list of its outputs is kept so
+        that those no longer produced can still be removed
+        '''
+        self.previous_sources = {}
+        self.previous_outputs = dict.fromkeys(self.previous_outputs)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        data = {'version': MANIFEST_VERSION,
+                'sources': self.sources,
+                'outputs': self.outputs}
+        temp_path = f'{self.path}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(data, f, sort_keys=True)
+        os.replace(temp_path, self.path)
+
+    def begin(self):
+        '''
+        Start recording a build, discarding anything recorded by an earlier
+        build which failed to finish
+        '''
+        self.sources = {}
+        self.outputs = {}
+
+    def advance(self):
+        '''
+        Make this build the previous one, for generators which stay resident
+        and build more than once (see `quiescent.watch`)
+        '''
+        self.previous_sources = self.sources
+        self.previous_outputs = self.outputs
+        self.sources = {}
+        self.outputs = {}
+
+    def digest(self, path, stat=None):
+        '''
+        Return the content hash of a source file, trusting the previous build's
+        hash if the file's mtime and size are unchanged
+        '''
+        if path in self.sources:
+            return self.sources[path]['hash']
+        stat = stat or os.stat(path)
+        previous = self.previous_sources.get(path)
+        if (previous and previous['mtime'] == stat.st_mtime_ns
+                and previous['size'] == stat.st_size):
+            content_hash = previous['hash']
+        else:
+            content_hash = file_digest(path)
+        self.sources[path] = {'mtime': stat.st_mtime_ns,
+                              'size': stat.st_size,
+                              'hash': content_hash}
+        return content_hash
+
+    def changed(self, path, stat=None):
+        '''Has the content of `path` changed since the previous build?'''
+        previous = self.previous_sources.get(path)
+        content_hash = self.digest(path, stat=stat)
+        return previous is None or previous['hash'] != content_hash
+
+    def post(self, path, stat=None):
+        '''
+        The post metadata recorded for `path` by the previous build, or None if
+        the source has changed (or is new)
+        '''
+        if self.changed(path, stat=stat):
+            return None
+        meta = self.previous_sources[path].get('post')
+        if meta is not None:
+            self.sources[path]['post'] = meta
+        return meta
+
+    def record_post(self, path, meta):
+        self.digest(path)
+        self.sources[path]['post'] = meta
+
+    def output_changed(self, output_dir, output, key):
+        '''
+        Does `output` (relative to `output_dir`) need to be regenerated? It
+        does if its key differs from the previous build or it has gone missing
+        '''
+        return (self.previous_outputs.get(output) != key
+                or not os.path.exists(os.path.join(output_dir, output)))
+
+    def record_output(self, output, key):
+        self.outputs[output] = key
+
+    def stale_outputs(self):
+        '''Outputs of the previous build which were not produced by this one'''
+        return sorted(set(self.previous_outputs) - set(self.outputs))
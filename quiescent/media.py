@@ -0,0 +1,77 @@
+# Copyright 2018 Nolan Prescott
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Keeping media files in the output directory in sync with their sources
+  - a destination with the same size and mtime as its source is considered
+    up to date, copies preserve the source's mtime for that reason, when
+    linking such a copy is replaced with a link if one can be made
+  - files can be hardlinked instead of copied, falling back to a copy where
+    a link isn't possible (e.g. across filesystems)
+"""
+import logging
+import threading
+import shutil
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def up_to_date(source_stat, destination_stat):
+    return (os.path.samestat(source_stat, destination_stat)
+            or (source_stat.st_size == destination_stat.st_size
+                and source_stat.st_mtime_ns == destination_stat.st_mtime_ns))
+
+
+def sync_file(source, destination, link=False, source_stat=None):
+    '''
+    Bring `destination` up to date with `source`, returning None if it
+    already was, otherwise 'added' or 'modified' depending on whether there
+    was a destination before
+    '''
+    source_stat = source_stat or os.stat(source)
+    status = 'modified'
+    copied = False
+    try:
+        destination_stat = os.stat(destination)
+        if os.path.samestat(source_stat, destination_stat):
+            return None
+        copied = up_to_date(source_stat, destination_stat)
+        if copied and not link:
+            return None
+    except FileNotFoundError:
+        status = 'added'
+    # write next to the destination then swap it into place, this never
+    # writes through an existing hardlink back into the source
+    temp_path = f'{destination}.{os.getpid()}-{threading.get_ident()}.tmp'
+    if link:
+        try:
+            os.link(source, temp_path)
+            os.replace(temp_path, destination)
+            return status
+        except OSError as e:
+            if copied:
+                # a copy left by an earlier build, as good as it gets
+                return None
+            logger.debug(f'Unable to link {source}, copying instead: {e}')
+    try:
+        # on Linux shutil copies in the kernel, without going through Python
+        shutil.copy2(source, temp_path)
+        os.replace(temp_path, destination)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return status
@@ -0,0 +1,111 @@
+# Copyright 2018 Nolan Prescott
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Writing generated files to the output directory
+  - a file is written to a temporary name and renamed into place, so a web
+    server never sees a partially written page
+  - a file whose new content is identical to the existing file is left
+    untouched, keeping its mtime (and deploys, e.g. with rsync) unchanged
+  - compressed copies are reproducible, the gzip header has no name or
+    timestamp, so an unchanged file always compresses to an identical copy
+"""
+import hashlib
+import shutil
+import gzip
+import threading
+import os
+
+from .manifest import file_digest
+
+
+class AtomicFile:
+    '''
+    A file-like object for use as a context manager, accepting either `str`
+    (encoded as UTF-8) or `bytes`. After it's closed `changed` says whether
+    the file at `path` was replaced and `existed` whether there was one.
+    '''
+    def __init__(self, path, buffering=1 << 16):
+        self.path = path
+        self.buffering = buffering
+        self.changed = None
+        self.existed = None
+        self._temp_path = (f'{path}.{os.getpid()}-{threading.get_ident()}'
+                           '.tmp')
+        self._file = None
+        self._digest = hashlib.sha256()
+        self._size = 0
+
+    def __enter__(self):
+        self._file = open(self._temp_path, 'wb', buffering=self.buffering)
+        return self
+
+    @property
+    def status(self):
+        '''None for an unchanged file, otherwise "added" or "modified"'''
+        if not self.changed:
+            return None
+        return 'modified' if self.existed else 'added'
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self._file.write(data)
+        self._digest.update(data)
+        self._size += len(data)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._file.close()
+        if exc_type is not None:
+            os.remove(self._temp_path)
+            return False
+        try:
+            self.existed = os.path.isfile(self.path)
+            if self.existed and self._identical():
+                os.remove(self._temp_path)
+                self.changed = False
+            else:
+                os.replace(self._temp_path, self.path)
+                self.changed = True
+        except BaseException:
+            if os.path.exists(self._temp_path):
+                os.remove(self._temp_path)
+            raise
+        return False
+
+    def _identical(self):
+        # sizes are cheap to compare, only read the existing file if needed
+        return (os.stat(self.path).st_size == self._size
+                and file_digest(self.path) == self._digest.hexdigest())
+
+
+def write_file(path, data):
+    '''write `data` (str or bytes) to `path`, returning its `status`'''
+    with AtomicFile(path) as f:
+        f.write(data)
+    return f.status
+
+
+def write_gzip(path, compresslevel=9):
+    '''
+    Write a gzip-compressed copy of `path` next to it (as `path` + ".gz"),
+    returning the copy's `status`
+    '''
+    with open(path, 'rb') as source, AtomicFile(f'{path}.gz') as f:
+        with gzip.GzipFile(filename='', mode='wb', fileobj=f,
+                           compresslevel=compresslevel,
+                           mtime=0) as compressed:
+            shutil.copyfileobj(source, compressed, 1 << 16)
+    return f.status
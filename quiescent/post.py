@@ -16,29 +16,91 @@
 from datetime import datetime, timezone
 import functools
 import urllib.parse
+import threading
 import os
 import re
 
 from mistune import Markdown
 
+from . import frontmatter
+
+
+class _LeaderMarkdown(Markdown):
+    '''
+    Markdown which notes where the output of the first top-level block (the
+    "leader") ends, so it can be sliced out of the rendered body rather than
+    converted a second time
+    '''
+    leader_end = None
+
+    def output(self, text, rules=None):
+        self.tokens = self.block(text, rules)
+        self.tokens.reverse()
+
+        self.inline.setup(self.block.def_links, self.block.def_footnotes)
+
+        out = self.renderer.placeholder()
+        self.leader_end = None
+        while self.pop():
+            out += self.tok()
+            if self.leader_end is None and out:
+                self.leader_end = len(out)
+        return out
+
+
+# one renderer per thread is shared by every post rendered on that thread,
+# mistune resets its state between documents
+_local = threading.local()
+
+
+def render_markdown(text):
+    '''
+    Convert a post body to HTML, returning a tuple of the body and its leader
+    (the first block of the body)
+    '''
+    markdown = getattr(_local, 'markdown', None)
+    if markdown is None:
+        markdown = _local.markdown = _LeaderMarkdown()
+    body = markdown(text)
+    return body, body[:markdown.leader_end]
+
 
 @functools.total_ordering
 class Post:
+    # a build holds every post in memory at once, slots keep each of them to
+    # a fixed handful of references
+    __slots__ = ('relative_dir', 'source', 'path', 'slug', 'title', '_date',
+                 'date', '_updated', 'tags', 'draft', 'assets', '_leader',
+                 '_body')
 
-    def __init__(self, relative_dir=''):
+    def __init__(self, relative_dir='', source=None):
         self.relative_dir = relative_dir
+        # the file a post was parsed from, lazy posts render their body from it
+        self.source = source
         self.path = None
+        self.slug = None
         self.title = None
         self._date = None
         self.date = None
-        self.leader = None
-        self.body = None
-        self.markup = None
-        self.markdown = Markdown()
+        # optional frontmatter
+        self._updated = None
+        self.tags = ()
+        self.draft = False
+        # the media the post's page refers to, found as the page is written
+        self.assets = ()
+        self._leader = None
+        self._body = None
 
     def __gt__(self, other):
-        '''used for sorting, reverse chronologically'''
-        return other._date > self._date
+        '''used for sorting, reverse chronologically, see `__lt__`'''
+        return other < self
+
+    def __lt__(self, other):
+        '''
+        reverse chronologically, posts sharing a date are ordered by path so
+        that the result doesn't depend on the order posts were collected in
+        '''
+        return (self._date, other.path or '') > (other._date, self.path or '')
 
     def __eq__(self, other):
         '''
@@ -50,44 +112,131 @@ class Post:
     def __repr__(self):
         return f'<Post: {self.title}, {self.date}>'
 
-    def parse(self, raw_text):
+    @property
+    def updated(self):
+        '''the date a post was last updated, if given, in the format of date'''
+        if self._updated is None:
+            return None
+        return self._updated.strftime('%Y-%m-%d')
+
+    @property
+    def body(self):
+        if self._body is None and self.source is not None:
+            self._render()
+        return self._body
+
+    @body.setter
+    def body(self, value):
+        self._body = value
+
+    @property
+    def leader(self):
+        if self._leader is None and self.source is not None:
+            self._render()
+        return self._leader
+
+    @leader.setter
+    def leader(self, value):
+        self._leader = value
+
+    def _render(self):
+        with open(self.source) as f:
+            frontmatter.read(f)
+            body = f.read()
+        self._body, self._leader = render_markdown(body)
+
+    def release(self):
+        '''
+        Drop the rendered body of a lazy post, it's rendered again from the
+        source file if it's needed later on
+        '''
+        if self.source is not None:
+            self._body = None
+
+    def parse(self, raw_text, lazy=False):
         '''
         Args:
             raw_text: string contents of a post file
+            lazy: only parse the frontmatter, the body and leader are
+                  rendered from `source` when first accessed
         '''
         try:
-            post = Post(relative_dir=self.relative_dir)
             meta, body = self._split(raw_text)
-            post.title = meta['title']
-            post.slug = slugify(post.title)
-            post.path = os.path.join(self.relative_dir, f'{post.slug}.html')
-            post._date = self._parse_date(meta['date'])
-            post.date = post._date.strftime('%Y-%m-%d')
-            post.body = self.markdown(body)
-            post.leader = self.markdown(self._parse_leader(body))
+            post = self._from_meta(meta)
+            if not lazy:
+                post.body, post.leader = render_markdown(body)
             return post
         except (ValueError, KeyError, TypeError) as e:
             raise ValueError(f'Unable to parse post from:\n{raw_text[:50]}')
 
-    @staticmethod
-    def _split(text):
+    @classmethod
+    def read(cls, path, relative_dir=''):
         '''
-        Take as input text comprising a post file:
+        A lazy post (see `parse`) from the file at `path`, reading no further
+        than the end of its frontmatter
+        '''
+        try:
+            with open(path) as f:
+                meta = frontmatter.read(f)
+            return cls(relative_dir=relative_dir, source=path)._from_meta(meta)
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError(f'Unable to parse post from:\n{path}\n\t{e}')
 
-            title: some text
-            date: 2015-12-01
-            ++++
-            ... post contents ...
+    def _from_meta(self, meta):
+        post = Post(relative_dir=self.relative_dir, source=self.source)
+        post.title = meta['title']
+        post.slug = slugify(post.title)
+        post.path = os.path.join(self.relative_dir, f'{post.slug}.html')
+        post._date = self._parse_date(meta['date'])
+        post.date = post._date.strftime('%Y-%m-%d')
+        if 'updated' in meta:
+            post._updated = self._parse_date(meta['updated'])
+        post.tags = frontmatter.parse_list(meta.get('tags', ''))
+        post.draft = frontmatter.parse_boolean(meta.get('draft', 'no'))
+        return post
 
-        and return a tuple of a dictionary of the top "metadata" kv-pairs and
-        a string of the rest of the file
+    def to_dict(self):
         '''
-        frontmatter, body = re.split(r'^\+\+\+$', text, maxsplit=1, flags=re.M)
-        lines = frontmatter.strip().split('\n')
-        line_pairs = (line.split(':', maxsplit=1) for line in lines)
-        meta = {key.strip().lower(): value.strip()
-                for key, value in line_pairs}
-        return meta, body
+        The metadata needed to list a post on the index, archive and feed,
+        without its body, in a form suitable for the build manifest
+        '''
+        return {'relative_dir': self.relative_dir,
+                'path': self.path,
+                'title': self.title,
+                'slug': self.slug,
+                'timestamp': self._date.timestamp(),
+                'updated': (self._updated.timestamp()
+                            if self._updated is not None else None),
+                'tags': list(self.tags),
+                'draft': self.draft,
+                'assets': list(self.assets),
+                'leader': self.leader}
+
+    @classmethod
+    def from_dict(cls, data, source=None):
+        post = cls(relative_dir=data['relative_dir'], source=source)
+        post.path = data['path']
+        post.title = data['title']
+        post.slug = data['slug']
+        post._date = datetime.fromtimestamp(data['timestamp'], timezone.utc)
+        post.date = post._date.strftime('%Y-%m-%d')
+        if data['updated'] is not None:
+            post._updated = datetime.fromtimestamp(data['updated'],
+                                                   timezone.utc)
+        post.tags = tuple(data['tags'])
+        post.draft = data['draft']
+        post.assets = tuple(data['assets'])
+        post.leader = data['leader']
+        return post
+
+    @staticmethod
+    def _split(text):
+        '''
+        Take as input text comprising a post file and return a tuple of a
+        dictionary of the top "metadata" kv-pairs and a string of the rest of
+        the file, see `quiescent.frontmatter.split`
+        '''
+        return frontmatter.split(text)
 
     @staticmethod
     def _parse_date(text, date_spec='%Y-%m-%d'):
@@ -95,21 +244,6 @@ class Post:
                 .strptime(text, date_spec)
                 .replace(tzinfo=timezone.utc))
 
-    @staticmethod
-    def _parse_leader(post_body):
-        '''
-        I refer to the first paragraph of a post as a "leader" and like to extract
-        it out automatically to generate an index page. Small idiosyncracy,
-        Python's `re` module won't split on a zero-width match (e.g. `^$`) so
-        we're splitting on the first two newlines ¯\_(ツ)_/¯
-        Args:
-            post_body: string, a post, stripped of frontmatter
-        '''
-        first_paragraph, *_ = (post_body
-                               .strip() # excess whitespace
-                               .split('\n\n', maxsplit=1))
-        return first_paragraph
-
 
 def slugify(text):
     '''
@@ -0,0 +1,81 @@
+# Copyright 2018 Nolan Prescott
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+A single traversal of the posts directory, finding posts, media directories
+and the media within them, keeping each file's stat result for later use
+(e.g. by the build manifest) rather than asking the filesystem again
+"""
+from collections import namedtuple
+import os
+
+
+class SourceFile(namedtuple('SourceFile', 'directory name stat')):
+    __slots__ = ()
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, self.name)
+
+
+class SourceTree:
+    def __init__(self):
+        self.posts = []
+        self.media_directories = []
+        self.media = []
+
+
+def scan_tree(posts_dir, media_dir_name, post_suffix='.md'):
+    '''
+    Walk `posts_dir` once, in a stable (sorted) order. Any `post_suffix` file
+    is a post, unless it's in a directory named `media_dir_name`, all files
+    directly within those are media.
+
+    Like os.walk, symlinked directories aren't followed, except that one
+    named `media_dir_name` is still listed (but nothing beneath it walked).
+    '''
+    tree = SourceTree()
+    # (directory, is it media, is it a symlink)
+    pending = [(posts_dir, False, False)]
+    while pending:
+        directory, is_media, is_link = pending.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            # like os.walk, a missing or unreadable directory has no files
+            continue
+        subdirectories = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if is_link:
+                    continue
+                in_media = entry.name == media_dir_name
+                if in_media:
+                    tree.media_directories.append(entry.path)
+                subdirectories.append((entry.path, in_media, False))
+            elif entry.is_symlink() and entry.is_dir():
+                if entry.name == media_dir_name and not is_link:
+                    tree.media_directories.append(entry.path)
+                    subdirectories.append((entry.path, True, True))
+            elif is_media and entry.is_file():
+                tree.media.append(SourceFile(directory, entry.name,
+                                             entry.stat()))
+            elif entry.name.endswith(post_suffix) and entry.is_file():
+                tree.posts.append(SourceFile(directory, entry.name,
+                                             entry.stat()))
+        # depth first, in name order
+        pending.extend(reversed(subdirectories))
+    return tree
@@ -0,0 +1,267 @@
+# Copyright 2018 Nolan Prescott
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+A development server for previewing a site while writing it
+  - serves the output directory (GET and HEAD only) with ETags, so unchanged
+    files are revalidated rather than transferred again, and single byte
+    ranges
+  - HTML pages get a small script which listens for server-sent events,
+    reloading the page whenever a rebuild finishes
+  - not meant for serving a site publicly, use a real web-server for that
+"""
+from email.utils import formatdate
+import urllib.parse
+import mimetypes
+import asyncio
+import logging
+import re
+import os
+
+from .watch import Watcher
+
+logger = logging.getLogger(__name__)
+
+EVENTS_PATH = '/__quiescent__/events'
+
+RELOAD_SCRIPT = f'''<script>
+new EventSource("{EVENTS_PATH}").addEventListener("reload", function () {{
+  window.location.reload();
+}});
+</script>
+'''.encode()
+
+REASONS = {200: 'OK', 206: 'Partial Content', 304: 'Not Modified',
+           400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           416: 'Range Not Satisfiable'}
+
+RANGE = re.compile(r'bytes=(\d*)-(\d*)$')
+
+
+def parse_range(header, size):
+    '''
+    Return the (start, end) (inclusive) of a single byte range, None if the
+    header isn't a single range (serve the whole file), or raise ValueError
+    if the range can't be satisfied
+    '''
+    match = RANGE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # a suffix, the last N bytes
+        start, end = max(0, size - int(last)), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+class DevServer:
+    def __init__(self, root, chunk_size=1 << 16):
+        self.root = os.path.realpath(root)
+        self.chunk_size = chunk_size
+        self._listeners = set()
+        self._loop = None
+        self._server = None
+
+    async def start(self, host='127.0.0.1', port=8000):
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def close(self):
+        for queue in self._listeners:
+            queue.put_nowait(None)
+        self._server.close()
+        await self._server.wait_closed()
+
+    def reload(self):
+        '''tell every open page to reload, safe to call from any thread'''
+        if self._loop is None:
+            # not serving yet, so there's nothing open to reload
+            return
+        self._loop.call_soon_threadsafe(self._broadcast, 'reload')
+
+    def _broadcast(self, event):
+        for queue in self._listeners:
+            queue.put_nowait(event)
+
+    def resolve(self, url_path):
+        '''
+        The file to serve for `url_path`, or None, nothing outside the root
+        directory is ever served
+        '''
+        path = urllib.parse.unquote(url_path.split('?', 1)[0])
+        full_path = os.path.realpath(os.path.join(self.root,
+                                                  path.lstrip('/')))
+        if os.path.commonpath([self.root, full_path]) != self.root:
+            return None
+        if os.path.isdir(full_path):
+            full_path = os.path.join(full_path, 'index.html')
+        if not os.path.isfile(full_path):
+            return None
+        return full_path
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            try:
+                method, target, _ = request_line.decode('latin-1').split()
+            except ValueError:
+                await self._respond(writer, 400)
+                return
+            if method not in ('GET', 'HEAD'):
+                await self._respond(writer, 405, {'Allow': 'GET, HEAD'})
+                return
+            if target.split('?', 1)[0] == EVENTS_PATH:
+                await self._events(writer)
+                return
+            await self._serve_file(writer, method, target, headers)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, headers=None, body=b''):
+        headers = dict(headers or {})
+        headers.setdefault('Content-Length', str(len(body)))
+        headers['Connection'] = 'close'
+        lines = [f'HTTP/1.1 {status} {REASONS[status]}']
+        lines.extend(f'{name}: {value}' for name, value in headers.items())
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        writer.write(body)
+        await writer.drain()
+
+    async def _serve_file(self, writer, method, target, request_headers):
+        path = self.resolve(target)
+        if path is None:
+            await self._respond(writer, 404, body=b'Not Found')
+            return
+        stat = os.stat(path)
+        content_type, _ = mimetypes.guess_type(path)
+        content_type = content_type or 'application/octet-stream'
+        body = None
+        size = stat.st_size
+        if content_type == 'text/html':
+            with open(path, 'rb') as f:
+                body = self._inject_reload(f.read())
+            size = len(body)
+        headers = {
+            'Content-Type': content_type,
+            'Accept-Ranges': 'bytes',
+            # always revalidate, the ETag makes that cheap
+            'Cache-Control': 'no-cache',
+            'ETag': f'"{stat.st_mtime_ns:x}-{size:x}"',
+            'Last-Modified': formatdate(stat.st_mtime, usegmt=True),
+        }
+        if request_headers.get('if-none-match') == headers['ETag']:
+            await self._respond(writer, 304, headers)
+            return
+
+        status, start, end = 200, 0, size - 1
+        if 'range' in request_headers:
+            try:
+                byte_range = parse_range(request_headers['range'], size)
+            except ValueError:
+                await self._respond(writer, 416,
+                                    {'Content-Range': f'bytes */{size}'})
+                return
+            if byte_range is not None:
+                status, (start, end) = 206, byte_range
+                headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+        headers['Content-Length'] = str(end - start + 1)
+        await self._respond(writer, status, headers)
+        if method == 'HEAD':
+            return
+        if body is not None:
+            writer.write(body[start:end + 1])
+            await writer.drain()
+            return
+        with open(path, 'rb') as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                writer.write(chunk)
+                await writer.drain()
+
+    @staticmethod
+    def _inject_reload(html):
+        index = html.rfind(b'</body>')
+        if index == -1:
+            return html + RELOAD_SCRIPT
+        return html[:index] + RELOAD_SCRIPT + html[index:]
+
+    async def _events(self, writer):
+        queue = asyncio.Queue()
+        self._listeners.add(queue)
+        try:
+            writer.write(b'HTTP/1.1 200 OK\r\n'
+                         b'Content-Type: text/event-stream\r\n'
+                         b'Cache-Control: no-cache\r\n'
+                         b'Connection: keep-alive\r\n\r\n')
+            await writer.drain()
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                writer.write(f'event: {event}\ndata: \n\n'.encode())
+                await writer.drain()
+        finally:
+            self._listeners.discard(queue)
+
+
+async def _serve(generator, host, port, interval):
+    server = DevServer(generator.output_dir)
+    watcher = Watcher(generator, interval=interval,
+                      on_build=lambda generator: server.reload())
+    loop = asyncio.get_running_loop()
+    # build before serving anything
+    await loop.run_in_executor(None, watcher.check)
+    host, port = await server.start(host, port)
+    logger.info(f'Serving {generator.output_dir} at http://{host}:{port}/')
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            # builds run on a thread, the server keeps responding meanwhile
+            await loop.run_in_executor(None, watcher.check)
+    finally:
+        await server.close()
+
+
+def serve(generator, host='127.0.0.1', port=8000, interval=1.0):
+    '''
+    Build the site, serve the output directory, and rebuild (reloading any
+    open pages) whenever the sources change, until interrupted
+    '''
+    try:
+        asyncio.run(_serve(generator, host, port, interval))
+    except KeyboardInterrupt:
+        pass
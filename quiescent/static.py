@@ -15,28 +15,95 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from collections import namedtuple
+import contextlib
+import functools
 import configparser
 import argparse
 import logging
-import shutil
 import json
-import sys
+import time
 import os
 import re
 
+from .assets import AssetMap, fingerprint
 from .post import Post
-from .feed import feed
-from .templite import Templite
+from .feed import last_updated, write_feed
+from .manifest import BuildManifest, build_key
+from .media import sync_file
+from .output import AtomicFile, write_file, write_gzip
+from .scan import scan_tree
+from .templite import BytecodeCache, TemplateLoader
 
 logger = logging.getLogger(__name__)
 
+# outputs with a compressed copy, see `StaticGenerator.compress_outputs`
+COMPRESSED_SUFFIXES = ('.html', '.atom', '.xml', '.css', '.js', '.svg',
+                       '.json', '.txt')
+
+# the generator a worker process was started with, see _worker_pool
+_worker_generator = None
+
+
+# the `page` of an archive template, `previous` and `next` are the paths of
+# the neighbouring pages or None at either end
+Page = namedtuple('Page', ['number', 'previous', 'next'])
+
+
+def _init_worker(generator):
+    global _worker_generator
+    _worker_generator = generator
+
+
+def _call_safely(function, arg):
+    '''
+    Return a tuple of (success, result, seconds), where a failed call's
+    result is the exception, so one failure doesn't stop the rest of a map
+    '''
+    start = time.perf_counter()
+    try:
+        return True, function(arg), time.perf_counter() - start
+    except Exception as e:
+        return False, e, time.perf_counter() - start
+
+
+def _call_in_worker(method_name, arg):
+    return _call_safely(getattr(_worker_generator, method_name), arg)
+
+
+class ConfigurationError(Exception):
+    '''the configuration file is missing, or missing or invalid settings'''
+
 
 class StaticGenerator:
-    def __init__(self, config_file=None):
+    def __init__(self, config_file=None, full=False, jobs=1,
+                 link_media=False, io_threads=4, precompress=False,
+                 fingerprint_media=False, timings=None):
         self.config_file = config_file
         self.config = None
+        self.full = full
+        self.jobs = jobs
+        self.link_media = link_media
+        self.io_threads = io_threads
+        self.precompress = precompress
+        self.fingerprint_media = fingerprint_media
+        self.assets = AssetMap()
+        self._assets_key = None
+        # template name -> whether it uses {% asset %}, found once a build
+        self._asset_templates = {}
+        # a `quiescent.timing.Timings` to record the build in, if profiling
+        self.timings = timings
+        self.manifest = None
         self.all_posts = []
+        # (file, exception) for every output which couldn't be written
+        self.failures = []
+        # output files touched by the build, relative to the output directory
+        self.changes = {'added': [], 'modified': [], 'deleted': []}
+        self.templates = None
+        self._source_tree = None
+        self._pool = None
+        self._io_pool = None
         self.index_template = 'index.html'
         self.archive_template = 'archive.html'
         self.post_template = 'post.html'
@@ -54,96 +121,504 @@ class StaticGenerator:
             self.feed_name = self.config['name']
             self.feed_link = self.config['feed link']
             self.template_dir = self.config['templates directory']
+            self.index_posts = self.config.getint('index posts', fallback=10)
+            # 0 puts every post on a single archive page
+            self.archive_page_size = self.config.getint('archive page size',
+                                                        fallback=0)
+            self.feed_entries = self.config.getint('feed entries',
+                                                   fallback=10)
+            # entries with only the leader of each post, not the whole body
+            self.feed_summary = self.config.getboolean('feed summary',
+                                                       fallback=False)
         except Exception as e:
-            logger.error("An error occurred in initial configuration, do "
-                         "you have the necessary configuration file and "
-                         "templates?\n\tTry using the --boostrap command")
-            sys.exit(1)
+            raise ConfigurationError(f'{self.config_file}: {e!r}') from e
+        state_dir = os.path.join(self.output_dir, '.quiescent')
+        # compiled templates are kept alongside the configuration rather than
+        # in the output directory, which is published
+        bytecode_cache = BytecodeCache(os.path.join(
+            os.path.dirname(os.path.abspath(self.config_file)), '.quiescent',
+            'templates'))
+        self.templates = TemplateLoader(self.template_dir,
+                                        bytecode_cache=bytecode_cache,
+                                        records=(Post, Page))
+        self.manifest = BuildManifest(os.path.join(state_dir, 'manifest.json'))
+        self.manifest.load()
+        if self.full:
+            self.manifest.forget()
+
+    def __getstate__(self):
+        '''
+        Workers only need the configuration, leave the (potentially large)
+        build state behind when sending a generator to a worker process
+        '''
+        state = dict(self.__dict__)
+        state.update(manifest=None, all_posts=[], failures=[], changes=None,
+                     _source_tree=None, _pool=None, _io_pool=None,
+                     timings=None)
+        return state
+
+    def build(self):
+        self.manifest.begin()
+        self._source_tree = None
+        self.all_posts = []
+        self.failures = []
+        self.changes = {'added': [], 'modified': [], 'deleted': []}
+        with self._phase('build'):
+            # worker processes are given the asset map as they start, so
+            # it's found before starting any
+            with self._phase('fingerprint_assets'):
+                self.assets = self.fingerprint_assets()
+                self._assets_key = build_key(self.assets.assets)
+                self._asset_templates = {}
+            with self._worker_pool(), self._thread_pool():
+                with self._phase('process_posts'):
+                    self.process_posts()
+                with self._phase('write_generated_files'):
+                    self.write_generated_files()
+                with self._phase('copy_media'):
+                    self.copy_media()
+                if self.fingerprint_media:
+                    self.write_asset_manifest()
+                if self.precompress:
+                    with self._phase('compress_outputs'):
+                        self.compress_outputs()
+            with self._phase('remove_stale_outputs'):
+                self.remove_stale_outputs()
+            with self._phase('prune_template_cache'):
+                self.prune_template_cache()
+            self.manifest.save()
+            self.manifest.advance()
+
+    def _phase(self, name):
+        if self.timings is None:
+            return contextlib.nullcontext()
+        return self.timings.phase(name)
+
+    @contextlib.contextmanager
+    def _worker_pool(self):
+        if self.jobs <= 1:
+            yield
+            return
+        with ProcessPoolExecutor(max_workers=self.jobs,
+                                 initializer=_init_worker,
+                                 initargs=(self,)) as pool:
+            self._pool = pool
+            try:
+                yield
+            finally:
+                self._pool = None
+
+    @contextlib.contextmanager
+    def _thread_pool(self):
+        if self.io_threads <= 1:
+            yield
+            return
+        with ThreadPoolExecutor(max_workers=self.io_threads) as pool:
+            self._io_pool = pool
+            try:
+                yield
+            finally:
+                self._io_pool = None
+
+    def _map(self, method, items, name=str, io=False, verb='process'):
+        '''
+        Apply `method` of this generator to each of `items`, spread across the
+        worker processes if there are any (or the I/O threads otherwise, or
+        if `io` is set), returning results in order.
+
+        An item which fails is reported as "Failed to `verb` `name(item)`"
+        and recorded in `failures`, its result is None.
+        '''
+        call = functools.partial(_call_safely, method)
+        if self._pool is not None and not io:
+            chunksize = max(1, len(items) // (self.jobs * 4))
+            outcomes = self._pool.map(_call_in_worker,
+                                      [method.__name__] * len(items),
+                                      items,
+                                      chunksize=chunksize)
+        elif self._io_pool is not None:
+            outcomes = self._io_pool.map(call, items)
+        else:
+            outcomes = map(call, items)
+        results = []
+        for item, (success, result, seconds) in zip(items, outcomes):
+            if self.timings is not None:
+                self.timings.record(method.__name__, name(item), seconds)
+            if not success:
+                logger.error(f'Failed to {verb} {name(item)}\n\t{result}')
+                self.failures.append((name(item), result))
+                result = None
+            results.append(result)
+        return results
+
+    @property
+    def source_tree(self):
+        '''the posts directory, scanned once per build'''
+        if self._source_tree is None:
+            self._source_tree = scan_tree(self.posts_dir, self.media_dir)
+        return self._source_tree
 
     def collect_posts(self, from_dir):
         '''
         Walk the directory containing posts and return any with a `.md` suffix as a
         tuple of (directory, filename)
         '''
-        post_files = []
-        for root, _, files in os.walk(from_dir):
-            for _file in files:
-                if _file.endswith('.md'):
-                    post_files.append((root, _file))
-        return post_files
+        return [(post.directory, post.name)
+                for post in scan_tree(from_dir, self.media_dir).posts]
 
     def find_media_directories(self, directory, media_directory):
-        directory_paths = []
-        for root, directories, _ in os.walk(directory):
-            for dir in directories:
-                if dir == media_directory:
-                    directory_paths.append(os.path.join(root, dir))
-        return directory_paths
+        return scan_tree(directory, media_directory).media_directories
+
+    def fingerprint_assets(self):
+        '''
+        The fingerprinted name of every media file, see `quiescent.assets`,
+        or an empty map (leaving media under its own name) if not enabled
+        '''
+        if not self.fingerprint_media:
+            return AssetMap()
+        assets = {}
+        for media in self.source_tree.media:
+            name = os.path.relpath(media.path, self.posts_dir)
+            name = name.replace(os.sep, '/')
+            digest = self.manifest.digest(media.path, stat=media.stat)
+            assets[name] = fingerprint(name, digest)
+        return AssetMap(assets)
+
+    def write_asset_manifest(self, output='assets.json'):
+        '''write the map of media to fingerprinted names to `output`'''
+        self.manifest.record_output(output, None)
+        status = write_file(os.path.join(self.output_dir, output),
+                            self.assets.to_json())
+        self._record_change(output, status)
+
+    def media_output(self, media):
+        '''where `media` goes, relative to the output directory'''
+        name = os.path.relpath(media.path, self.posts_dir)
+        return self.assets(name.replace(os.sep, '/'))
 
     def copy_media(self):
-        # There may be some potential for optimization here, everything is
-        # copied every time, which has the nice effect of grabbing updated
-        # files with the same name
-        media_dirs = self.find_media_directories(self.posts_dir, self.media_dir)
-        for each_dir in media_dirs:
-            relative_dest_dir = os.path.relpath(each_dir, self.posts_dir)
-            out_path = os.path.join(self.output_dir, relative_dest_dir)
-            os.makedirs(out_path, exist_ok=True)
-            for filename in os.listdir(each_dir):
-                shutil.copy(os.path.join(each_dir, filename), out_path)
+        '''
+        Bring the media in the output directory up to date, only new or
+        changed files are copied (or linked, see `sync_file`). Media whose
+        source has been deleted is removed along with other stale outputs.
+        '''
+        created = set()
+        outputs = []
+        for media in self.source_tree.media:
+            output = self.media_output(media)
+            relative_dest_dir = os.path.dirname(output)
+            if relative_dest_dir not in created:
+                out_path = os.path.join(self.output_dir, relative_dest_dir)
+                os.makedirs(out_path, exist_ok=True)
+                created.add(relative_dest_dir)
+            self.manifest.record_output(output, None)
+            outputs.append(output)
+        statuses = self._map(self.sync_media, self.source_tree.media,
+                             name=lambda media: media.path, io=True,
+                             verb='copy')
+        for output, status in zip(outputs, statuses):
+            self._record_change(output, status)
+
+    def sync_media(self, media):
+        destination = os.path.join(self.output_dir, self.media_output(media))
+        return sync_file(media.path, destination, link=self.link_media,
+                         source_stat=media.stat)
+
+    def _record_change(self, output, status):
+        '''`status` is one of 'added', 'modified', 'deleted' or None'''
+        if status is not None:
+            self.changes[status].append(os.path.normpath(output))
+
+    def write_changes(self, path, format='json'):
+        '''
+        Write the list of output files changed by the last build to `path`,
+        either as JSON, with lists of files 'added', 'modified' and
+        'deleted', or as a plain list of the files added or modified,
+        suitable for `rsync --files-from`
+        '''
+        changes = {status: sorted(outputs)
+                   for status, outputs in self.changes.items()}
+        if format == 'json':
+            text = json.dumps(changes, indent=2) + '\n'
+        else:
+            text = ''.join(f'{output}\n' for output in
+                           sorted(changes['added'] + changes['modified']))
+        with open(path, 'w') as f:
+            f.write(text)
 
     def process_posts(self):
-        for directory, filename in self.collect_posts(self.posts_dir):
-            file_path = os.path.join(directory, filename)
-            with open(file_path) as f:
-                text = f.read()
-            try:
-                relative_dir = os.path.relpath(directory, self.posts_dir)
-                post = Post(relative_dir=relative_dir).parse(text)
+        '''
+        Collect every post, new or changed posts have their frontmatter
+        parsed, posts unchanged since the previous build are restored from
+        the manifest without reading their source. Bodies are only rendered
+        when needed, see `Post.body`.
+        '''
+        changed = []
+        for source in self.source_tree.posts:
+            meta = self.manifest.post(source.path, stat=source.stat)
+            if meta is None:
+                changed.append(source.path)
+                continue
+            self.all_posts.append(Post.from_dict(meta, source=source.path))
+        for post in self._map(self.try_parse_post, changed, verb='read'):
+            # drafts aren't published, so never make it to the manifest and
+            # have their frontmatter read again by every build
+            if post is not None and not post.draft:
                 self.all_posts.append(post)
-            except ValueError as e:
-                logger.warning(f'Failed to create post: {post}\n\t{e}')
         self.all_posts = sorted(self.all_posts)
 
+    def try_parse_post(self, file_path):
+        try:
+            return self.parse_post(file_path)
+        except ValueError as e:
+            logger.warning(f'Failed to create post: {file_path}\n\t{e}')
+            return None
+
+    def parse_post(self, file_path):
+        relative_dir = os.path.relpath(os.path.dirname(file_path),
+                                       self.posts_dir)
+        return Post.read(file_path, relative_dir=relative_dir)
+
     def render_page(self, template_name, **kwargs):
-        template_file = os.path.join(self.template_dir, template_name)
-        with open(template_file) as f:
-            template_text = f.read()
-        template = Templite(template_text)
-        return template.render(kwargs)
+        kwargs.setdefault('asset', self.assets)
+        return self.templates.get(template_name).render(kwargs)
+
+    def write_page(self, output, template_name, **kwargs):
+        '''
+        Render a template straight into `output` (relative to the output
+        directory), without building the page in memory first. An existing
+        page is only replaced if its content has changed, the return value is
+        the page's `AtomicFile.status`.
+        '''
+        output_path = os.path.join(self.output_dir, output)
+        # reconstitute the input tree in the output directory
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        start = time.perf_counter()
+        template = self.templates.get(template_name)
+        loaded = time.perf_counter()
+        kwargs.setdefault('asset', self.assets)
+        with AtomicFile(output_path) as f:
+            template.render_to(f, kwargs)
+        if self.timings is not None:
+            # only pages written in this process, not by worker processes
+            self.timings.record('template loads', template_name,
+                                loaded - start)
+            self.timings.record('template renders',
+                                f'{template_name}: {output}',
+                                time.perf_counter() - loaded)
+        return f.status
+
+    def _template_digest(self, template_name):
+        '''a template's digest covers the templates it extends'''
+        return [self.manifest.digest(os.path.join(self.template_dir, name))
+                for name in self.templates.dependencies(template_name)]
+
+    def _template_assets_key(self, template_name):
+        '''
+        A template using `{% asset %}` depends on every asset, any other only
+        on the assets referred to by what it's given (see `_post_assets`)
+        '''
+        uses_assets = self._asset_templates.get(template_name)
+        if uses_assets is None:
+            uses_assets = self.templates.uses_action(template_name, 'asset')
+            self._asset_templates[template_name] = uses_assets
+        return self._assets_key if uses_assets else None
+
+    def _output_key(self, template_name, *parts):
+        return build_key(self.manifest.digest(self.config_file),
+                         self._template_digest(template_name),
+                         self._template_assets_key(template_name),
+                         *parts)
+
+    def _post_assets(self, post):
+        '''
+        The fingerprinted names of the media a post refers to, so that its
+        page is only rewritten when one of those changes, not any media at all
+        '''
+        return (self.fingerprint_media,
+                [(name, self.assets.assets.get(name)) for name in post.assets])
+
+    def _post_key(self, post):
+        return self._output_key(self.post_template,
+                                self.manifest.digest(post.source),
+                                self._post_assets(post))
+
+    def _needs_writing(self, output, key):
+        '''record `output` as produced by this build, return if outdated'''
+        self.manifest.record_output(output, key)
+        return self.manifest.output_changed(self.output_dir, output, key)
+
+    def write_post_page(self, post):
+        '''
+        Write the page for a single post, returning the post's leader (which
+        is a by-product of rendering it) for the index and the manifest, the
+        names of the media it refers to and the `status` of the page
+        '''
+        lookups = set()
+        if self.fingerprint_media:
+            body, leader = post.body, post.leader
+            post.body = self.assets.rewrite(body, post.relative_dir, lookups)
+            post.leader = self.assets.rewrite(leader, post.relative_dir,
+                                              lookups)
+        status = self.write_page(post.path, self.post_template, post=post)
+        leader = post.leader
+        post.release()
+        return leader, sorted(lookups), status
 
     def write_generated_files(self):
+        with self._phase('write_post_pages'):
+            outdated = []
+            for post in self.all_posts:
+                if self._needs_writing(post.path, self._post_key(post)):
+                    outdated.append(post)
+            results = self._map(self.write_post_page, outdated,
+                                name=lambda post: post.path,
+                                verb='write')
+            for post, result in zip(outdated, results):
+                if result is None:
+                    # make sure the next build tries again
+                    self.manifest.record_output(post.path, None)
+                    continue
+                post.leader, assets, status = result
+                if tuple(assets) != post.assets:
+                    # only known once the page is written
+                    post.assets = tuple(assets)
+                    self.manifest.record_output(post.path,
+                                                self._post_key(post))
+                self._record_change(post.path, status)
+        # new and changed posts have been rendered (and their leaders found)
+        # by now, so the manifest can be brought up to date
         for post in self.all_posts:
-            post_page = self.render_page(self.post_template, post=post)
-            output_tree = os.path.join(self.output_dir, post.relative_dir)
-            # reconstitute the input tree in the output directory
-            os.makedirs(output_tree, exist_ok=True)
-            output_path = os.path.join(self.output_dir, post.path)
-            with open(output_path, 'w') as f:
-                f.write(post_page)
-
-        index_path = os.path.join(self.output_dir, self.index_template)
-        index = self.render_page(self.index_template,
-                                 front_posts=self.all_posts[:10])
-        with open(index_path, 'w') as f:
-            f.write(index)
-
-        archive_path = os.path.join(self.output_dir, self.archive_template)
-        archive = self.render_page(self.archive_template,
-                                   all_posts=self.all_posts)
-        with open(archive_path, 'w') as f:
-            f.write(archive)
-
-        self.write_feed()
-
-    def write_feed(self, post_limit=10):
+            self.manifest.record_post(post.source, post.to_dict())
+
+        with self._phase('write_index'):
+            self.write_index()
+        with self._phase('write_archive'):
+            self.write_archive()
+        with self._phase('write_feed'):
+            self.write_feed()
+
+    def write_index(self):
+        front_posts = self.all_posts[:self.index_posts]
+        key = self._output_key(self.index_template,
+                               [p.to_dict() for p in front_posts])
+        if self._needs_writing(self.index_template, key):
+            status = self.write_page(self.index_template, self.index_template,
+                                     front_posts=front_posts)
+            self._record_change(self.index_template, status)
+
+    def archive_page_path(self, number):
+        '''
+        The first page of the archive is `archive.html`, the rest go in
+        `archive/page/<number>.html`
+        '''
+        if number == 1:
+            return self.archive_template
+        stem, extension = os.path.splitext(self.archive_template)
+        return os.path.join(stem, 'page', f'{number}{extension}')
+
+    def write_archive(self):
+        '''
+        Write the archive, split into pages of `archive page size` posts.
+        Each page is keyed on its own posts, so a change to one post only
+        rewrites the page listing it (unless its position changes, e.g. a new
+        post shifts every later post along a page).
+        '''
+        size = self.archive_page_size or max(1, len(self.all_posts))
+        slices = [self.all_posts[start:start + size]
+                  for start in range(0, len(self.all_posts), size)] or [[]]
+        for number, posts in enumerate(slices, start=1):
+            page = Page(number=number,
+                        previous=(self.archive_page_path(number - 1)
+                                  if number > 1 else None),
+                        next=(self.archive_page_path(number + 1)
+                              if number < len(slices) else None))
+            output = self.archive_page_path(number)
+            key = self._output_key(self.archive_template, page,
+                                   [p.to_dict() for p in posts])
+            if self._needs_writing(output, key):
+                status = self.write_page(output, self.archive_template,
+                                         all_posts=posts, page=page)
+                self._record_change(output, status)
+
+    def write_feed(self, post_limit=None):
+        '''
+        Write the feed of the newest `post_limit` (by default `feed entries`)
+        posts straight to the output file, entry by entry
+        '''
+        if post_limit is None:
+            post_limit = self.feed_entries
         recent_posts = self.all_posts[:post_limit]
-        feed_string = feed(recent_posts,
-                           date=datetime.now(timezone.utc),
-                           name=self.feed_name,
-                           domain=self.domain,
-                           feed_link=self.feed_link,
-                           feed_author=self.author)
+        key = build_key(self.manifest.digest(self.config_file),
+                        [(p.path, self.manifest.digest(p.source),
+                          self._post_assets(p))
+                         for p in recent_posts])
+        if not self._needs_writing(self.feed_link, key):
+            return
+        if self.assets and not self.feed_summary:
+            # leaders were rewritten along with the post pages
+            for post in recent_posts:
+                post.body = self.assets.rewrite(post.body, post.relative_dir)
         output_path = os.path.join(self.output_dir, self.feed_link)
-        with open(output_path, 'wb') as f:
-            f.write(feed_string.encode())
+        with AtomicFile(output_path) as f:
+            write_feed(f.write, recent_posts,
+                       date=last_updated(recent_posts),
+                       name=self.feed_name,
+                       domain=self.domain,
+                       feed_link=self.feed_link,
+                       feed_author=self.author,
+                       summary=self.feed_summary)
+        self._record_change(self.feed_link, f.status)
+
+    def compress_outputs(self):
+        '''
+        Write a gzip-compressed copy of every text output (for a web-server
+        to send as is, e.g. nginx's `gzip_static`), only outputs changed by
+        this build, or without a compressed copy, are compressed again
+        '''
+        changed = set(self.changes['added'] + self.changes['modified'])
+        outdated = []
+        for output in list(self.manifest.outputs):
+            if (not output.endswith(COMPRESSED_SUFFIXES)
+                    or not os.path.exists(os.path.join(self.output_dir,
+                                                       output))):
+                # not text, or failed to be written
+                continue
+            compressed = f'{output}.gz'
+            self.manifest.record_output(compressed, None)
+            if (os.path.normpath(output) in changed or not os.path.exists(
+                    os.path.join(self.output_dir, compressed))):
+                outdated.append(output)
+        statuses = self._map(self.compress_output, outdated, io=True,
+                             verb='compress')
+        for output, status in zip(outdated, statuses):
+            self._record_change(f'{output}.gz', status)
+
+    def compress_output(self, output):
+        return write_gzip(os.path.join(self.output_dir, output))
+
+    def remove_stale_outputs(self):
+        '''
+        Remove files written by the previous build but not this one, along
+        with any directories that leaves empty
+        '''
+        for output in self.manifest.stale_outputs():
+            try:
+                os.remove(os.path.join(self.output_dir, output))
+                self._record_change(output, 'deleted')
+            except FileNotFoundError:
+                pass
+            directory = os.path.dirname(output)
+            while directory:
+                try:
+                    os.rmdir(os.path.join(self.output_dir, directory))
+                except OSError:
+                    break
+                directory = os.path.dirname(directory)
+
+    def prune_template_cache(self):
+        '''
+        Remove compiled templates no longer matching any template, so edits
+        don't pile up in the bytecode cache
+        '''
+        self.templates.prune_cache()
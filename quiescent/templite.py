@@ -24,8 +24,32 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import importlib.util
+import hashlib
+import keyword
+import marshal
+import threading
+import os
 import re
 
+from . import __version__
+
+# bump when the code generated for templates changes shape, to invalidate any
+# cached compiled templates
+CACHE_VERSION = 4
+
+
+def tokenize(text):
+    # omit comments, match either {{expression}} or {%action%} non-greedily
+    return re.split(r'(?s)({{.*?}}|{%.*?%})', text)
+
+
+def _tag_words(token):
+    '''the words of an {%action%} token, or None for any other token'''
+    if token.startswith('{%'):
+        return token[2:-2].strip().split()
+    return None
+
 
 class CodeBuilder:
     def __init__(self, indent=0):
@@ -50,11 +74,13 @@ class CodeBuilder:
     def __str__(self):
         return ''.join(str(c) for c in self.code)
 
-    def get_globals(self):
+    def compile(self):
         assert self.current_indent == 0
-        python_source = str(self)
+        return compile(str(self), '<templite>', 'exec')
+
+    def get_globals(self):
         global_namespace = {}
-        exec(python_source, global_namespace)
+        exec(self.compile(), global_namespace)
         return global_namespace
 
 
@@ -63,27 +89,150 @@ class TempliteSyntaxError(Exception):
 
 
 class Templite:
-    def __init__(self, text, *contexts):
+    '''
+    `records` are classes whose instances only carry plain data attributes,
+    for those `{{ obj.attr }}` is compiled to direct attribute access instead
+    of the general (and slower) lookup through `do_dots`
+    '''
+    def __init__(self, text, *contexts, loader=None, records=()):
         self.all_variables = set()
         self.loop_variables = set()
+        # names of the templates this one extends, nearest first
+        self.dependencies = []
+        self.records = frozenset(records)
         self.context = {}
         for context in contexts:
             self.context.update(context)
+        tokens = self._inherit(tokenize(text), loader)
+        self.code = self._compile(tokens)
+        self._render_function = self._load_render_function(self.code)
+
+    @classmethod
+    def from_code(cls, code, *contexts, dependencies=(), records=()):
+        '''
+        Create a template from the `code` attribute of a previously compiled
+        Templite, skipping compilation altogether
+        '''
+        template = cls.__new__(cls)
+        template.dependencies = list(dependencies)
+        template.records = frozenset(records)
+        template.context = {}
+        for context in contexts:
+            template.context.update(context)
+        template.code = code
+        template._render_function = cls._load_render_function(code)
+        return template
+
+    @staticmethod
+    def _load_render_function(code):
+        global_namespace = {}
+        exec(code, global_namespace)
+        return global_namespace['render_function']
+
+    def _inherit(self, tokens, loader):
+        '''
+        Resolve {% extends %} and {% block %} at compile time: follow the chain
+        of parent templates (fetched through `loader`) collecting the most
+        derived definition of every block, then substitute those into the
+        root template. The result is a flat list of tokens without any
+        inheritance tags.
+        '''
+        blocks = {}
+        while True:
+            parent = self._extends(tokens)
+            for name, body in self._blocks(tokens).items():
+                blocks.setdefault(name, body)
+            if parent is None:
+                break
+            if loader is None:
+                raise TempliteSyntaxError(
+                    f'Bad syntax, no loader to extend:\n\t{parent}')
+            if parent in self.dependencies:
+                raise TempliteSyntaxError(
+                    f'Bad syntax, circular extends:\n\t{parent}')
+            self.dependencies.append(parent)
+            tokens = loader.tokens(parent)
+        return self._fill_blocks(tokens, blocks)
+
+    @staticmethod
+    def _extends(tokens):
+        parent = None
+        for token in tokens:
+            words = _tag_words(token)
+            if not words or words[0] != 'extends':
+                continue
+            if len(words) != 2 or parent is not None:
+                raise TempliteSyntaxError(f'Bad syntax:\n\t{token}')
+            parent = words[1].strip('\'"')
+        return parent
+
+    @staticmethod
+    def _block_end(tokens, start):
+        '''index of the {% endblock %} closing the block opened at `start`'''
+        words = _tag_words(tokens[start])
+        if len(words) != 2:
+            raise TempliteSyntaxError(f'Bad syntax:\n\t{tokens[start]}')
+        depth = 0
+        for index in range(start, len(tokens)):
+            words = _tag_words(tokens[index])
+            if not words:
+                continue
+            if words[0] == 'block':
+                depth += 1
+            elif words[0] == 'endblock':
+                if len(words) > 2:
+                    raise TempliteSyntaxError(
+                        f'Bad syntax:\n\t{tokens[index]}')
+                depth -= 1
+                if depth == 0:
+                    return index
+        raise TempliteSyntaxError('Bad syntax, unmatched action:\n\tblock')
+
+    def _blocks(self, tokens):
+        '''map every block defined in `tokens`, however nested, to its body'''
+        blocks = {}
+        for index, token in enumerate(tokens):
+            words = _tag_words(token)
+            if words and words[0] == 'block':
+                end = self._block_end(tokens, index)
+                if words[1] in blocks:
+                    raise TempliteSyntaxError(
+                        f'Bad syntax, duplicate block:\n\t{words[1]}')
+                blocks[words[1]] = tokens[index + 1:end]
+        return blocks
+
+    def _fill_blocks(self, tokens, blocks):
+        flat = []
+        index = 0
+        while index < len(tokens):
+            words = _tag_words(tokens[index])
+            if words and words[0] == 'block':
+                end = self._block_end(tokens, index)
+                body = blocks.get(words[1], tokens[index + 1:end])
+                flat.extend(self._fill_blocks(body, blocks))
+                index = end + 1
+                continue
+            if words and words[0] == 'endblock':
+                raise TempliteSyntaxError(f'Bad syntax:\n\t{tokens[index]}')
+            flat.append(tokens[index])
+            index += 1
+        return flat
+
+    def _compile(self, tokens):
         code = CodeBuilder()
-        code.add_line('def render_function(context, do_dots):')
+        # fragments are handed to `write` as they're produced, rather than
+        # collected in the generated code
+        code.add_line('def render_function(context, do_dots, write, records):')
         code.indent()
         # where variables are extracted
         variable_code = code.add_section()
-        code.add_line('result = []')
         # for tracking if/endif, for/endfor etc.
         operations_stack = []
-        # omit comments, match either {{expression}} or {%action%} non-greedily
-        tokens = re.split(r'(?s)({{.*?}}|{%.*?%})', text)
 
         for token in tokens:
             if token.startswith('{{'):
                 expression = self._expr_code(token[2:-2].strip())
-                code.add_line(f'result.append(str({expression}))')
+                code.add_line(f'write(str({expression}))')
             elif token.startswith('{%'):
                 words = token[2:-2].strip().split()
                 if words[0] == 'if':
@@ -100,6 +249,13 @@ class Templite:
                     code.add_line(
                         f'for c_{words[1]} in {self._expr_code(words[3])}:')
                     code.indent()
+                elif words[0] == 'asset':
+                    # the path of a (possibly fingerprinted) file, looked up
+                    # with the `asset` function given in the context
+                    if len(words) != 2:
+                        raise TempliteSyntaxError(f'Bad syntax:\n\t{token}')
+                    self._variable('asset', self.all_variables)
+                    code.add_line(f'write(str(c_asset({repr(words[1])})))')
                 elif words[0].startswith('end'):
                     if len(words) != 1:
                         raise TempliteSyntaxError(f'Bad syntax:\n\t{token}')
@@ -113,7 +269,7 @@ class Templite:
                     raise TempliteSyntaxError(f'Bad syntax:\n\t{token}')
             else:
                 if token:
-                    code.add_line(f'result.append({repr(token)})')
+                    code.add_line(f'write({repr(token)})')
 
         if operations_stack:
             raise TempliteSyntaxError(
@@ -121,16 +277,26 @@ class Templite:
 
         for variable in self.all_variables - self.loop_variables:
             variable_code.add_line(f'c_{variable} = context[{repr(variable)}]')
-        code.add_line("return ''.join(result)")
+        # an empty template still needs a function body
+        code.add_line('return')
         code.dedent()
-        self._render_function = code.get_globals()['render_function']
+        return code.compile()
 
     def _expr_code(self, expression):
         if '.' in expression:
             dots = expression.split('.')
             code = self._expr_code(dots[0])
-            args = ', '.join(repr(d) for d in dots[1:])
-            code = f'do_dots({code}, {args})'
+            rest = dots[1:]
+            # the first lookup is made on a plain variable, which can be
+            # checked cheaply for being a record before using it
+            first = rest[0]
+            if first.isidentifier() and not keyword.iskeyword(first):
+                code = (f'({code}.{first} if {code}.__class__ in records '
+                        f'else do_dots({code}, {repr(first)}))')
+                rest = rest[1:]
+            if rest:
+                args = ', '.join(repr(d) for d in rest)
+                code = f'do_dots({code}, {args})'
         else:
             self._variable(expression, self.all_variables)
             code = f'c_{expression}'
@@ -142,10 +308,22 @@ class Templite:
         variable_set.add(name)
 
     def render(self, context=None):
+        result = []
+        self.render_to(result.append, context)
+        return ''.join(result)
+
+    def render_to(self, write, context=None):
+        '''
+        Render the template piece by piece, `write` is either a callable or
+        a file-like object with a `write` method, so that a page can be
+        streamed to a file without ever being held in memory as a whole
+        '''
         render_context = dict(self.context)
         if context:
             render_context.update(context)
-        return self._render_function(render_context, self._infer_properties)
+        write = getattr(write, 'write', write)
+        self._render_function(render_context, self._infer_properties, write,
+                              self.records)
 
     def _infer_properties(self, value, *properties):
         for prop in properties:
@@ -156,3 +334,183 @@ class Templite:
             if callable(value):
                 value = value()
         return value
+
+
+class BytecodeCache:
+    """
+    A directory of compiled templates, keyed on the hash of their source (and
+    the versions of quiescent and Python) so compilation can be skipped across
+    separate runs. Entries are any value `marshal` can handle, the loader
+    stores a template's code along with the hashes of the templates it
+    extends.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    @staticmethod
+    def key(source):
+        digest = hashlib.sha256()
+        for part in (__version__, str(CACHE_VERSION), source):
+            digest.update(part.encode())
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.cache')
+
+    def load(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        magic = importlib.util.MAGIC_NUMBER
+        if not data.startswith(magic):
+            return None
+        try:
+            return marshal.loads(data[len(magic):])
+        except (EOFError, ValueError, TypeError):
+            return None
+
+    def dump(self, key, value):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        # other processes (or threads) may be writing the same entry, never
+        # expose a partially written file
+        temp_path = f'{path}.{os.getpid()}-{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(importlib.util.MAGIC_NUMBER)
+            f.write(marshal.dumps(value))
+        os.replace(temp_path, path)
+
+    def prune(self, keep):
+        '''remove every entry other than those with a key in `keep`'''
+        keep = {f'{key}.cache' for key in keep}
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if entry.name.endswith('.cache') and entry.name not in keep:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    continue
+
+
+class TemplateLoader:
+    """
+    Load templates by name from a directory, each template is compiled once
+    and reused until its file (or that of a template it extends) is modified.
+    Given a `BytecodeCache` compiled templates are also kept on disk between
+    runs.
+    """
+
+    def __init__(self, directory, bytecode_cache=None, records=()):
+        self.directory = directory
+        self.bytecode_cache = bytecode_cache
+        self.records = records
+        # path -> (mtime, source, tokens), so a parent template shared by
+        # many others is only read and tokenized once
+        self._sources = {}
+        # name -> (mtimes of the template and its parents, Templite)
+        self._cache = {}
+
+    def __getstate__(self):
+        # compiled render functions can't be pickled, start from scratch
+        state = dict(self.__dict__)
+        state['_sources'] = {}
+        state['_cache'] = {}
+        return state
+
+    def _mtime(self, name):
+        return os.stat(os.path.join(self.directory, name)).st_mtime_ns
+
+    def _load(self, name):
+        path = os.path.join(self.directory, name)
+        mtime = os.stat(path).st_mtime_ns
+        cached = self._sources.get(path)
+        if cached is None or cached[0] != mtime:
+            with open(path) as f:
+                source = f.read()
+            cached = (mtime, source, None)
+            self._sources[path] = cached
+        return cached
+
+    def source(self, name):
+        return self._load(name)[1]
+
+    def tokens(self, name):
+        mtime, source, tokens = self._load(name)
+        if tokens is None:
+            tokens = tokenize(source)
+            self._sources[os.path.join(self.directory, name)] = (
+                mtime, source, tokens)
+        return tokens
+
+    def get(self, name):
+        cached = self._cache.get(name)
+        if cached is not None:
+            mtimes, template = cached
+            names = [name, *template.dependencies]
+            if mtimes == [self._mtime(n) for n in names]:
+                return template
+        template = self._compile(name)
+        names = [name, *template.dependencies]
+        self._cache[name] = ([self._mtime(n) for n in names], template)
+        return template
+
+    def dependencies(self, name):
+        '''the names of the templates `name` is built from, itself first'''
+        return [name, *self.get(name).dependencies]
+
+    def uses_action(self, name, action):
+        '''
+        Does the template `name`, or any it extends, use the `{% action %}`
+        tag?
+        '''
+        for used in self.dependencies(name):
+            for token in self.tokens(used):
+                words = _tag_words(token)
+                if words and words[0] == action:
+                    return True
+        return False
+
+    def prune_cache(self):
+        '''
+        Remove compiled templates from the bytecode cache, other than those of
+        the templates loaded so far (and their parents) as they are now
+        '''
+        if self.bytecode_cache is None:
+            return
+        keep = set()
+        for name, (_, template) in self._cache.items():
+            for used in [name, *template.dependencies]:
+                try:
+                    keep.add(self.bytecode_cache.key(self.source(used)))
+                except FileNotFoundError:
+                    # deleted since, its entry goes too
+                    continue
+        self.bytecode_cache.prune(keep)
+
+    def _compile(self, name):
+        source = self.source(name)
+        if self.bytecode_cache is None:
+            return Templite(source, loader=self, records=self.records)
+        key = self.bytecode_cache.key(source)
+        cached = self.bytecode_cache.load(key)
+        if cached is not None:
+            dependencies, code = cached
+            key_of = self.bytecode_cache.key
+            if all(key_of(self.source(parent)) == digest
+                   for parent, digest in dependencies):
+                return Templite.from_code(
+                    code, dependencies=[parent for parent, _ in dependencies],
+                    records=self.records)
+        template = Templite(source, loader=self, records=self.records)
+        key_of = self.bytecode_cache.key
+        dependencies = tuple((parent, key_of(self.source(parent)))
+                             for parent in template.dependencies)
+        self.bytecode_cache.dump(key, (dependencies, template.code))
+        return template
@@ -0,0 +1,66 @@
+# Copyright 2018 Nolan Prescott
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+from quiescent.assets import AssetMap, fingerprint
+
+
+class AssetMapTests(unittest.TestCase):
+
+    def setUp(self):
+        self.assets = AssetMap({
+            'media/style.css': fingerprint('media/style.css', 'a' * 64),
+            '2018/media/photo.png': fingerprint('2018/media/photo.png',
+                                                'b' * 64),
+        })
+
+    def test_lookup(self):
+        self.assertEqual(self.assets('media/style.css'),
+                         'media/style.aaaaaaaaaa.css')
+        self.assertEqual(self.assets('/media/style.css?v=1'),
+                         '/media/style.aaaaaaaaaa.css?v=1')
+        self.assertEqual(self.assets('media/other.css'), 'media/other.css')
+
+    def test_rewrite_relative_to_page(self):
+        html = ('<img src="media/photo.png" alt="">'
+                "<a href='media/photo.png#top'>photo</a>")
+        self.assertEqual(self.assets.rewrite(html, '2018'),
+                         '<img src="media/photo.bbbbbbbbbb.png" alt="">'
+                         "<a href='media/photo.bbbbbbbbbb.png#top'>photo</a>")
+
+    def test_rewrite_relative_to_root(self):
+        html = ('<img src="2018/media/photo.png">'
+                '<img src="/media/style.css">')
+        self.assertEqual(self.assets.rewrite(html, '.'),
+                         '<img src="2018/media/photo.bbbbbbbbbb.png">'
+                         '<img src="/media/style.aaaaaaaaaa.css">')
+
+    def test_rewrite_lookups(self):
+        html = ('<img src="media/photo.png"><img src="/media/style.css">'
+                '<a href="https://example.com/">')
+        lookups = set()
+        self.assets.rewrite(html, '2018', lookups)
+        self.assertEqual(lookups, {'2018/media/photo.png', 'media/style.css'})
+
+        # names which aren't (yet) assets are recorded too
+        lookups = set()
+        AssetMap().rewrite('<img src="media/photo.png">', '2018', lookups)
+        self.assertEqual(lookups, {'2018/media/photo.png', 'media/photo.png'})
+
+    def test_external_untouched(self):
+        html = ('<a href="https://example.com/media/style.css">'
+                '<a href="#media/style.css">')
+        self.assertEqual(self.assets.rewrite(html, '.'), html)
@@ -14,9 +14,9 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import unittest
-from datetime import datetime
+from datetime import datetime, timezone
 
-from quiescent.feed import feed
+from quiescent.feed import feed, write_feed, last_updated, EPOCH
 from quiescent.post import Post
 
 
@@ -68,3 +68,48 @@ class FeedTests(unittest.TestCase):
                            '<id>example.com</id><updated>2017-12-01T00:00:00</updated>'
                            '<content type="html">&lt;h1&gt;not much here&lt;/h1&gt;</content></entry></feed>')
         self.assertEqual(f, expected_string)
+
+    def test_summary_feed(self):
+        p = Post()
+        p.title = 'First Post'
+        p._date = datetime.strptime('12-2017-01', '%m-%Y-%d')
+        p.body = '<p>leader</p>\n<p>the rest</p>'
+        p.leader = '<p>leader</p>\n'
+
+        f = feed([p],
+                 date=datetime.strptime('12-2017-11', '%m-%Y-%d'),
+                 name='testing is important',
+                 domain='example.com',
+                 feed_link='feed.xml',
+                 feed_author='fizz buzz',
+                 summary=True)
+        self.assertIn('<summary type="html">&lt;p&gt;leader&lt;/p&gt;\n'
+                      '</summary></entry>', f)
+        self.assertNotIn('the rest', f)
+
+    def test_written_incrementally(self):
+        parts = []
+        write_feed(parts.append, [],
+                   date=datetime.strptime('12-2017-11', '%m-%Y-%d'),
+                   name='test configuration',
+                   domain='example.com',
+                   feed_link='feed.xml',
+                   feed_author='unit tester')
+        self.assertGreater(len(parts), 1)
+        self.assertEqual(''.join(parts), feed(
+            [],
+            date=datetime.strptime('12-2017-11', '%m-%Y-%d'),
+            name='test configuration',
+            domain='example.com',
+            feed_link='feed.xml',
+            feed_author='unit tester'))
+
+    def test_last_updated(self):
+        posts = []
+        for day in (3, 1, 2):
+            p = Post()
+            p._date = datetime(2017, 12, day, tzinfo=timezone.utc)
+            posts.append(p)
+        self.assertEqual(last_updated(posts),
+                         datetime(2017, 12, 3, tzinfo=timezone.utc))
+        self.assertEqual(last_updated([]), EPOCH)
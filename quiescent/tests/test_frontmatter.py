@@ -0,0 +1,57 @@
+# Copyright 2018 Nolan Prescott
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+import io
+
+from quiescent import frontmatter
+
+
+class FrontmatterTests(unittest.TestCase):
+
+    def test_split(self):
+        meta, body = frontmatter.split('\nTitle: test\n\ndate: 2017-01-01\n'
+                                       '+++\nthe body\n+++\nand more\n')
+        self.assertEqual(meta, {'title': 'test', 'date': '2017-01-01'})
+        self.assertEqual(body, 'the body\n+++\nand more\n')
+
+    def test_split_without_body(self):
+        self.assertEqual(frontmatter.split('title: test\n+++'),
+                         ({'title': 'test'}, ''))
+
+    def test_split_negative(self):
+        for text in ('title: test\n', 'title: test\n++++\n',
+                     'title: test\n++\n', 'title test\n+++\n'):
+            with self.subTest(text=text):
+                with self.assertRaises(ValueError):
+                    frontmatter.split(text)
+
+    def test_read_stops_at_separator(self):
+        f = io.StringIO('title: test\ndate: 2017-01-01\n+++\nthe body\n')
+        self.assertEqual(frontmatter.read(f),
+                         {'title': 'test', 'date': '2017-01-01'})
+        self.assertEqual(f.read(), 'the body\n')
+
+    def test_read_negative(self):
+        with self.assertRaises(ValueError):
+            frontmatter.read(io.StringIO('title: test\n'))
+
+    def test_typed_values(self):
+        self.assertEqual(frontmatter.parse_list('a, b c,,'), ('a', 'b c'))
+        self.assertEqual(frontmatter.parse_list(''), ())
+        self.assertIs(frontmatter.parse_boolean('On'), True)
+        self.assertIs(frontmatter.parse_boolean('0'), False)
+        with self.assertRaises(ValueError):
+            frontmatter.parse_boolean('maybe')
@@ -0,0 +1,72 @@
+# Copyright 2018 Nolan Prescott
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import tempfile
+import unittest
+import gzip
+import os
+
+from quiescent.output import AtomicFile, write_file, write_gzip
+
+
+class AtomicFileTests(unittest.TestCase):
+
+    def setUp(self):
+        self._tempdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._tempdir.name, 'page.html')
+
+    def tearDown(self):
+        self._tempdir.cleanup()
+
+    def read(self):
+        with open(self.path, encoding='utf-8') as f:
+            return f.read()
+
+    def test_new_file(self):
+        with AtomicFile(self.path) as f:
+            f.write('λ ')
+            f.write(b'bytes')
+        self.assertEqual((f.existed, f.changed), (False, True))
+        self.assertEqual(f.status, 'added')
+        self.assertEqual(self.read(), 'λ bytes')
+
+    def test_identical_file_untouched(self):
+        write_file(self.path, 'content')
+        os.utime(self.path, ns=(0, 0))
+        self.assertIsNone(write_file(self.path, 'content'))
+        self.assertEqual(os.stat(self.path).st_mtime_ns, 0)
+
+    def test_changed_file(self):
+        write_file(self.path, 'content')
+        # same size, different content
+        self.assertEqual(write_file(self.path, 'CONTENT'), 'modified')
+        self.assertEqual(self.read(), 'CONTENT')
+
+    def test_failed_write(self):
+        write_file(self.path, 'content')
+        with self.assertRaises(RuntimeError):
+            with AtomicFile(self.path) as f:
+                f.write('half a page')
+                raise RuntimeError()
+        self.assertEqual(self.read(), 'content')
+        self.assertEqual(os.listdir(self._tempdir.name), ['page.html'])
+
+    def test_gzip(self):
+        write_file(self.path, 'content ' * 100)
+        self.assertEqual(write_gzip(self.path), 'added')
+        with gzip.open(f'{self.path}.gz', 'rt') as f:
+            self.assertEqual(f.read(), 'content ' * 100)
+        # reproducible, so compressing again leaves the copy alone
+        self.assertIsNone(write_gzip(self.path))
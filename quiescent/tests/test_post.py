@@ -13,10 +13,12 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import tempfile
 import unittest
 import datetime
+import os
 
-from quiescent.post import Post, slugify
+from quiescent.post import Post, render_markdown, slugify
 
 
 class PostsTests(unittest.TestCase):
@@ -40,6 +42,27 @@ class PostsTests(unittest.TestCase):
                 with self.assertRaises(ValueError):
                     post.parse(i)
 
+    def test_optional_front_matter(self):
+        post = Post().parse('\ntitle: test\ndate: 2017-01-01\n'
+                            'updated: 2017-02-01\ntags: a, b\ndraft: yes\n'
+                            '+++\nfoo\n')
+        self.assertEqual(post.updated, '2017-02-01')
+        self.assertEqual(post.tags, ('a', 'b'))
+        self.assertTrue(post.draft)
+        restored = Post.from_dict(post.to_dict())
+        self.assertEqual((restored.updated, restored.tags, restored.draft),
+                         ('2017-02-01', ('a', 'b'), True))
+        plain = Post().parse('\ntitle: test\ndate: 2017-01-01\n+++\nfoo\n')
+        self.assertEqual((plain.updated, plain.tags, plain.draft),
+                         (None, (), False))
+
+    def test_bad_optional_front_matter(self):
+        for line in ('updated: soon', 'draft: maybe'):
+            with self.subTest(line=line):
+                with self.assertRaises(ValueError):
+                    Post().parse(f'title: test\ndate: 2017-01-01\n{line}\n'
+                                 '+++\n')
+
     def test_date_parsing(self):
         raw_text = '\ntitle: test\ndate: 2017-01-02\n+++\n'
         meta, _ = Post._split(raw_text)
@@ -49,17 +72,68 @@ class PostsTests(unittest.TestCase):
                              date.year == 2017]))
 
     def test_leader_parsing(self):
-        leader = Post._parse_leader('\nfoo bar baz\n\nfoo bar baz\n')
-        self.assertEqual(leader, 'foo bar baz')
+        body, leader = render_markdown('\nfoo bar baz\n\nfoo bar baz\n')
+        self.assertEqual(leader, '<p>foo bar baz</p>\n')
+        self.assertEqual(body, leader * 2)
 
     def test_post_parsing_leader(self):
-        _, body = Post._split('\ntitle: test\ndate: 2017-01-01\n+++\nfoo \nfoo \n\nthe rest\n')
-        leader = Post._parse_leader(body)
-        self.assertEqual(leader, 'foo \nfoo ')
+        _, body = Post._split('\ntitle: test\ndate: 2017-01-01\n+++\n'
+                              'foo \nfoo \n\nthe rest\n')
+        _, leader = render_markdown(body)
+        self.assertEqual(leader, '<p>foo \nfoo</p>\n')
 
     def test_leader_parsing_single_paragraph(self):
-        leader = Post._parse_leader('\nfoo bar baz\n')
-        self.assertEqual(leader, 'foo bar baz')
+        body, leader = render_markdown('\nfoo bar baz\n')
+        self.assertEqual(leader, '<p>foo bar baz</p>\n')
+        self.assertEqual(body, leader)
+
+    def test_rendered_leader(self):
+        post = Post().parse('\ntitle: test\ndate: 2017-01-01\n+++\n'
+                            'foo *bar*\nbaz\n\n- the\n- rest\n')
+        self.assertEqual(post.leader, '<p>foo <em>bar</em>\nbaz</p>\n')
+        self.assertTrue(post.body.startswith(post.leader))
+        self.assertIn('<li>rest</li>', post.body)
+
+    def test_rendered_leader_links(self):
+        # reference links defined later in the post resolve in the leader
+        post = Post().parse('\ntitle: test\ndate: 2017-01-01\n+++\n'
+                            '[a link][1]\n\n[1]: http://example.com\n')
+        self.assertEqual(post.leader,
+                         '<p><a href="http://example.com">a link</a></p>\n')
+
+    def test_empty_body(self):
+        post = Post().parse('\ntitle: test\ndate: 2017-01-01\n+++\n')
+        self.assertEqual((post.body, post.leader), ('', ''))
+
+    def test_lazy_parsing(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'post.md')
+            with open(source, 'w') as f:
+                f.write('\ntitle: test\ndate: 2017-01-01\n+++\nfoo\n\nbar\n')
+            with open(source) as f:
+                post = Post(source=source).parse(f.read(), lazy=True)
+            self.assertEqual(post.title, 'test')
+            self.assertIsNone(post._body)
+            self.assertEqual(post.leader, '<p>foo</p>\n')
+            self.assertEqual(post.body, '<p>foo</p>\n<p>bar</p>\n')
+            post.release()
+            self.assertIsNone(post._body)
+            self.assertEqual(post.leader, '<p>foo</p>\n')
+            self.assertEqual(post.body, '<p>foo</p>\n<p>bar</p>\n')
+
+    def test_read(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'post.md')
+            with open(source, 'w') as f:
+                f.write('title: test\ndate: 2017-01-01\n+++\nfoo\n+++\n')
+            post = Post.read(source, relative_dir='2017')
+            self.assertEqual(post.path, os.path.join('2017', 'test.html'))
+            self.assertIsNone(post._body)
+            self.assertEqual(post.body, '<p>foo\n+++</p>\n')
+            with open(source, 'w') as f:
+                f.write('title: test\ndate: 2017-01-01\n++++\nfoo\n')
+            with self.assertRaises(ValueError):
+                Post.read(source)
 
     def test_sorting(self):
         earlier = Post().parse('\ntitle: test\ndate: 2016-01-01\n+++\nfoo\n')
@@ -68,6 +142,14 @@ class PostsTests(unittest.TestCase):
         self.assertEqual(sorted([earlier, latest, later]),
                                 [latest, later, earlier])
 
+    def test_ordering_same_date(self):
+        a = Post().parse('\ntitle: a\ndate: 2017-01-01\n+++\nfoo\n')
+        b = Post().parse('\ntitle: b\ndate: 2017-01-01\n+++\nbar\n')
+        self.assertTrue(a < b)
+        self.assertTrue(b > a)
+        self.assertFalse(a > b)
+        self.assertFalse(b < a)
+
 
 class SlugifyTests(unittest.TestCase):
     def test_lowercase(self):
@@ -0,0 +1,79 @@
+# Copyright 2018 Nolan Prescott
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import tempfile
+import unittest
+import os
+
+from quiescent.scan import scan_tree
+
+
+class ScanTests(unittest.TestCase):
+
+    def test_scan_tree(self):
+        with tempfile.TemporaryDirectory() as root:
+            for path in ('b.md', 'a.md', 'notes.txt', '2018/c.md',
+                         '2018/media/image.png', '2018/media/readme.md',
+                         'media/style.css'):
+                path = os.path.join(root, path)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'w') as f:
+                    f.write(path)
+
+            tree = scan_tree(root, 'media')
+
+            def relative(files):
+                return [os.path.relpath(f.path, root) for f in files]
+            self.assertEqual(relative(tree.posts),
+                             ['a.md', 'b.md', os.path.join('2018', 'c.md')])
+            self.assertEqual(relative(tree.media),
+                             [os.path.join('2018', 'media', 'image.png'),
+                              os.path.join('2018', 'media', 'readme.md'),
+                              os.path.join('media', 'style.css')])
+            self.assertEqual([os.path.relpath(d, root)
+                              for d in tree.media_directories],
+                             ['media', os.path.join('2018', 'media')])
+            self.assertEqual(tree.posts[0].stat.st_size,
+                             len(os.path.join(root, 'a.md')))
+
+    def test_symlinked_directories_not_followed(self):
+        with tempfile.TemporaryDirectory() as root:
+            with open(os.path.join(root, 'a.md'), 'w') as f:
+                f.write('a')
+            os.symlink(root, os.path.join(root, 'loop'))
+            tree = scan_tree(root, 'media')
+            self.assertEqual([post.name for post in tree.posts], ['a.md'])
+
+    def test_symlinked_media_directory(self):
+        with tempfile.TemporaryDirectory() as root:
+            posts = os.path.join(root, 'posts')
+            shared = os.path.join(root, 'shared')
+            os.makedirs(os.path.join(shared, 'sub'))
+            os.makedirs(posts)
+            for path in ('p.png', os.path.join('sub', 'q.png')):
+                with open(os.path.join(shared, path), 'w') as f:
+                    f.write(path)
+            os.symlink(shared, os.path.join(posts, 'media'))
+            # a loop back through the media directory isn't walked
+            os.symlink(posts, os.path.join(shared, 'media'))
+            tree = scan_tree(posts, 'media')
+            self.assertEqual(tree.media_directories,
+                             [os.path.join(posts, 'media')])
+            self.assertEqual([media.name for media in tree.media], ['p.png'])
+
+    def test_missing_directory(self):
+        with tempfile.TemporaryDirectory() as root:
+            tree = scan_tree(os.path.join(root, 'missing'), 'media')
+            self.assertEqual((tree.posts, tree.media), ([], []))
@@ -0,0 +1,123 @@
+# Copyright 2018 Nolan Prescott
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import tempfile
+import unittest
+import asyncio
+import os
+
+from quiescent.serve import DevServer, parse_range, RELOAD_SCRIPT, EVENTS_PATH
+
+
+class ParseRangeTest(unittest.TestCase):
+
+    def test_ranges(self):
+        self.assertEqual(parse_range('bytes=0-9', 100), (0, 9))
+        self.assertEqual(parse_range('bytes=90-', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=-10', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=90-200', 100), (90, 99))
+
+    def test_unsupported(self):
+        self.assertIsNone(parse_range('bytes=0-1,5-6', 100))
+        self.assertIsNone(parse_range('lines=1-2', 100))
+
+    def test_unsatisfiable(self):
+        with self.assertRaises(ValueError):
+            parse_range('bytes=100-', 100)
+
+
+class DevServerTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self._tempdir = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self._tempdir.name, 'build')
+        os.makedirs(self.root)
+        with open(os.path.join(self.root, 'index.html'), 'w') as f:
+            f.write('<html><body>Index</body></html>')
+        with open(os.path.join(self.root, 'data.bin'), 'wb') as f:
+            f.write(bytes(range(100)))
+        with open(os.path.join(self._tempdir.name, 'secret'), 'w') as f:
+            f.write('secret')
+        self.server = DevServer(self.root)
+        self.host, self.port = await self.server.start('127.0.0.1', 0)
+
+    async def asyncTearDown(self):
+        await self.server.close()
+        self._tempdir.cleanup()
+
+    async def request(self, path, method='GET', **headers):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}']
+        lines.extend(f'{name.replace("_", "-")}: {value}'
+                     for name, value in headers.items())
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode())
+        response = await reader.read()
+        writer.close()
+        head, _, body = response.partition(b'\r\n\r\n')
+        status_line, *header_lines = head.decode().split('\r\n')
+        response_headers = dict(line.split(': ', 1) for line in header_lines)
+        return int(status_line.split()[1]), response_headers, body
+
+    async def test_html_gets_reload_script(self):
+        status, headers, body = await self.request('/')
+        self.assertEqual(status, 200)
+        self.assertEqual(headers['Content-Type'], 'text/html')
+        self.assertEqual(body, (b'<html><body>Index' + RELOAD_SCRIPT
+                                + b'</body></html>'))
+        self.assertEqual(int(headers['Content-Length']), len(body))
+
+    async def test_etag_revalidation(self):
+        _, headers, _ = await self.request('/data.bin')
+        status, _, body = await self.request(
+            '/data.bin', If_None_Match=headers['ETag'])
+        self.assertEqual(status, 304)
+        self.assertEqual(body, b'')
+        self.assertEqual(headers['Cache-Control'], 'no-cache')
+
+    async def test_range(self):
+        status, headers, body = await self.request('/data.bin',
+                                                   Range='bytes=10-19')
+        self.assertEqual(status, 206)
+        self.assertEqual(body, bytes(range(10, 20)))
+        self.assertEqual(headers['Content-Range'], 'bytes 10-19/100')
+        status, headers, _ = await self.request('/data.bin',
+                                                Range='bytes=200-')
+        self.assertEqual(status, 416)
+
+    async def test_head(self):
+        status, headers, body = await self.request('/data.bin', 'HEAD')
+        self.assertEqual(status, 200)
+        self.assertEqual(headers['Content-Length'], '100')
+        self.assertEqual(body, b'')
+
+    async def test_not_found(self):
+        status, _, _ = await self.request('/missing.html')
+        self.assertEqual(status, 404)
+        status, _, _ = await self.request('/../secret')
+        self.assertEqual(status, 404)
+        status, _, _ = await self.request('/%2e%2e/secret')
+        self.assertEqual(status, 404)
+
+    async def test_reload_event(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        writer.write(f'GET {EVENTS_PATH} HTTP/1.1\r\n\r\n'.encode())
+        head = await reader.readuntil(b'\r\n\r\n')
+        self.assertIn(b'text/event-stream', head)
+        # as called by the watcher, from another thread
+        await asyncio.get_running_loop().run_in_executor(
+            None, self.server.reload)
+        event = await asyncio.wait_for(reader.readuntil(b'\n\n'), 5)
+        self.assertEqual(event, b'event: reload\ndata: \n\n')
+        writer.close()
@@ -0,0 +1,580 @@
+# Copyright 2018 Nolan Prescott
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import tempfile
+import unittest
+import shutil
+import errno
+import gzip
+import json
+import os
+from unittest import mock
+
+from quiescent.static import StaticGenerator
+from quiescent.templite import BytecodeCache
+
+CONFIG = '''
+[STATIC]
+domain = https://example.com/
+name = test site
+author = unit tester
+output directory = {root}/build
+posts directory = {root}/posts
+media directory = media
+templates directory = {root}/templates
+date format = %Y-%m-%d
+feed link = feed.atom
+'''
+
+TEMPLATES = {
+    'post.html': '{{ post.title }}\n{{ post.body }}',
+    'index.html': '{% for post in front_posts %}{{ post.leader }}{% endfor %}',
+    'archive.html': '{% for post in all_posts %}{{ post.path }}\n{% endfor %}',
+}
+
+
+class CountingGenerator(StaticGenerator):
+    '''keep track of which templates were rendered, and how many times'''
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rendered = []
+
+    def write_page(self, output, template_name, **kwargs):
+        self.rendered.append(template_name)
+        return super().write_page(output, template_name, **kwargs)
+
+
+class SiteTestCase(unittest.TestCase):
+    '''a throwaway site, with configuration, templates and posts on disk'''
+
+    def setUp(self):
+        self._tempdir = tempfile.TemporaryDirectory()
+        self.root = self._tempdir.name
+        self.config_file = os.path.join(self.root, 'config.ini')
+        with open(self.config_file, 'w') as f:
+            f.write(CONFIG.format(root=self.root))
+        for name, text in TEMPLATES.items():
+            self.write(os.path.join('templates', name), text)
+
+    def tearDown(self):
+        self._tempdir.cleanup()
+
+    def write(self, relative_path, text):
+        path = os.path.join(self.root, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def write_post(self, relative_path, title, date, body='some text'):
+        return self.write(os.path.join('posts', relative_path),
+                          f'title: {title}\ndate: {date}\n+++\n{body}\n')
+
+    def read_output(self, relative_path):
+        with open(os.path.join(self.root, 'build', relative_path)) as f:
+            return f.read()
+
+    def build(self, generator_class=CountingGenerator, **kwargs):
+        generator = generator_class(config_file=self.config_file, **kwargs)
+        generator.configure()
+        generator.build()
+        return generator
+
+
+class IncrementalBuildTests(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write_post('first.md', 'First', '2017-01-01')
+        self.write_post('second.md', 'Second', '2017-01-02')
+
+    def test_initial_build(self):
+        generator = self.build()
+        self.assertEqual(sorted(generator.rendered),
+                         ['archive.html', 'index.html',
+                          'post.html', 'post.html'])
+        self.assertEqual(self.read_output('archive.html'),
+                         './second.html\n./first.html\n')
+        self.assertIn('<p>some text</p>', self.read_output('first.html'))
+
+    def test_unchanged_rebuild(self):
+        self.build()
+        generator = self.build()
+        self.assertEqual(generator.rendered, [])
+
+    def test_changed_post(self):
+        self.build()
+        self.write_post('first.md', 'First', '2017-01-01',
+                        body='some text\n\nnew text')
+        generator = self.build()
+        self.assertEqual(generator.rendered, ['post.html'])
+        self.assertIn('<p>new text</p>', self.read_output('first.html'))
+
+    def test_changed_leader(self):
+        self.build()
+        self.write_post('first.md', 'First', '2017-01-01', body='new text')
+        generator = self.build()
+        self.assertEqual(sorted(generator.rendered),
+                         ['archive.html', 'index.html', 'post.html'])
+        self.assertEqual(self.read_output('index.html'),
+                         '<p>some text</p>\n<p>new text</p>\n')
+
+    def test_changed_template(self):
+        self.build()
+        self.write(os.path.join('templates', 'post.html'), '{{ post.date }}')
+        generator = self.build()
+        self.assertEqual(generator.rendered, ['post.html', 'post.html'])
+        self.assertEqual(self.read_output('first.html'), '2017-01-01')
+
+    def test_deleted_post(self):
+        self.build()
+        os.remove(os.path.join(self.root, 'posts', 'first.md'))
+        self.build()
+        self.assertFalse(os.path.exists(
+            os.path.join(self.root, 'build', 'first.html')))
+        self.assertEqual(self.read_output('archive.html'), './second.html\n')
+
+    def test_full_build(self):
+        self.build()
+        generator = self.build(full=True)
+        self.assertEqual(len(generator.rendered), 4)
+
+    def test_full_build_removes_deleted_post(self):
+        self.build()
+        os.remove(os.path.join(self.root, 'posts', 'first.md'))
+        generator = self.build(full=True)
+        self.assertFalse(os.path.exists(
+            os.path.join(self.root, 'build', 'first.html')))
+        self.assertEqual(generator.changes['deleted'], ['first.html'])
+        self.assertEqual(self.read_output('archive.html'), './second.html\n')
+
+
+    def test_template_cache_pruned(self):
+        cache = os.path.join(self.root, '.quiescent', 'templates')
+        self.build()
+        self.assertEqual(len(os.listdir(cache)), 3)
+        self.assertFalse(os.path.exists(
+            os.path.join(self.root, 'build', '.quiescent', 'templates')))
+        self.write(os.path.join('templates', 'post.html'), '{{ post.date }}')
+        self.build()
+        self.assertEqual(len(os.listdir(cache)), 3)
+        self.assertIn(f"{BytecodeCache.key('{{ post.date }}')}.cache",
+                      os.listdir(cache))
+
+
+class ParallelBuildTests(SiteTestCase):
+
+    def test_parallel_output_identical(self):
+        for i in range(20):
+            self.write_post(f'nested/post-{i}.md', f'Post {i}',
+                            f'2017-01-{i % 5 + 1:02}', body=f'text {i}')
+        self.write_post('broken.md', 'Broken', 'not a date')
+        self.build(generator_class=StaticGenerator)
+        serial = self.read_all_pages()
+        self.build(generator_class=StaticGenerator, full=True, jobs=3)
+        self.assertEqual(self.read_all_pages(), serial)
+
+    def read_all_pages(self):
+        pages = {}
+        output_dir = os.path.join(self.root, 'build')
+        for root, _, files in os.walk(output_dir):
+            for name in files:
+                if name.endswith('.html'):
+                    path = os.path.join(root, name)
+                    with open(path, 'rb') as f:
+                        pages[path] = f.read()
+        return pages
+
+
+class InheritedTemplateTests(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write(os.path.join('templates', 'base.html'),
+                   '<{% block content %}{% endblock %}>')
+        self.write(os.path.join('templates', 'post.html'),
+                   '{% extends "base.html" %}'
+                   '{% block content %}{{ post.title }}{% endblock %}')
+        self.write_post('first.md', 'First', '2017-01-01')
+
+    def test_changed_base_template(self):
+        self.build()
+        self.assertEqual(self.read_output('first.html'), '<First>')
+        self.write(os.path.join('templates', 'base.html'),
+                   '[{% block content %}{% endblock %}]')
+        generator = self.build()
+        self.assertEqual(generator.rendered, ['post.html'])
+        self.assertEqual(self.read_output('first.html'), '[First]')
+
+
+class PaginationTests(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with open(self.config_file, 'a') as f:
+            f.write('index posts = 2\narchive page size = 2\n')
+        self.write(os.path.join('templates', 'archive.html'),
+                   '{{ page.number }} {{ page.previous }} {{ page.next }}\n'
+                   '{% for post in all_posts %}{{ post.path }}\n{% endfor %}')
+        for day in range(1, 6):
+            self.write_post(f'{day}.md', f'Post {day}', f'2017-01-0{day}')
+
+    def test_pages(self):
+        self.build()
+        self.assertEqual(self.read_output('index.html'),
+                         '<p>some text</p>\n' * 2)
+        self.assertEqual(self.read_output('archive.html'),
+                         '1 None archive/page/2.html\n'
+                         './post-5.html\n./post-4.html\n')
+        self.assertEqual(self.read_output('archive/page/2.html'),
+                         '2 archive.html archive/page/3.html\n'
+                         './post-3.html\n./post-2.html\n')
+        self.assertEqual(self.read_output('archive/page/3.html'),
+                         '3 archive/page/2.html None\n./post-1.html\n')
+
+    def test_only_changed_page_rendered(self):
+        self.build()
+        self.write_post('2.md', 'Post 2', '2017-01-02', body='new text')
+        generator = self.build()
+        self.assertEqual(sorted(generator.rendered),
+                         ['archive.html', 'post.html'])
+
+    def test_removed_page(self):
+        self.build()
+        os.remove(os.path.join(self.root, 'posts', '1.md'))
+        self.build()
+        self.assertFalse(os.path.exists(os.path.join(
+            self.root, 'build', 'archive', 'page', '3.html')))
+        self.assertEqual(self.read_output('archive/page/2.html'),
+                         '2 archive.html None\n'
+                         './post-3.html\n./post-2.html\n')
+
+
+class FeedTests(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for day in range(1, 4):
+            self.write_post(f'{day}.md', f'Post {day}', f'2017-01-0{day}',
+                            body='leader\n\nthe rest')
+
+    def test_entry_limit_and_summary(self):
+        with open(self.config_file, 'a') as f:
+            f.write('feed entries = 2\nfeed summary = yes\n')
+        self.build()
+        feed = self.read_output('feed.atom')
+        self.assertEqual(feed.count('<entry>'), 2)
+        self.assertNotIn('Post 1', feed)
+        self.assertEqual(feed.count('<summary type="html">'), 2)
+        self.assertNotIn('the rest', feed)
+
+    def test_full_content(self):
+        self.build()
+        feed = self.read_output('feed.atom')
+        self.assertEqual(feed.count('<entry>'), 3)
+        self.assertEqual(feed.count('&lt;p&gt;the rest&lt;/p&gt;'), 3)
+
+    def test_updated_with_newest_post(self):
+        self.build()
+        self.assertIn('<updated>2017-01-03T00:00:00+00:00</updated>'
+                      '<author>', self.read_output('feed.atom'))
+        # regenerated, but identical and so left alone
+        generator = self.build(full=True)
+        self.assertNotIn('feed.atom', generator.changes['modified'])
+
+
+class FrontmatterTests(SiteTestCase):
+
+    def test_drafts_unpublished(self):
+        self.write_post('first.md', 'First', '2017-01-01')
+        self.write('posts/draft.md', 'title: Draft\ndate: 2017-01-02\n'
+                   'draft: yes\n+++\nnot yet\n')
+        self.build()
+        self.assertFalse(os.path.exists(
+            os.path.join(self.root, 'build', 'draft.html')))
+        self.assertEqual(self.read_output('archive.html'), './first.html\n')
+        self.write('posts/draft.md', 'title: Draft\ndate: 2017-01-02\n'
+                   'draft: no\n+++\nnow\n')
+        self.build()
+        self.assertEqual(self.read_output('archive.html'),
+                         './draft.html\n./first.html\n')
+
+    def test_updated_in_feed(self):
+        self.write('posts/first.md', 'title: First\ndate: 2017-01-01\n'
+                   'updated: 2017-03-01\n+++\nfoo\n')
+        self.write_post('second.md', 'Second', '2017-01-02')
+        self.build()
+        feed = self.read_output('feed.atom')
+        self.assertIn('<updated>2017-03-01T00:00:00+00:00</updated>'
+                      '<author>', feed)
+        self.assertEqual(feed.count('2017-03-01T00:00:00+00:00'), 2)
+
+
+class MediaTests(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.image = self.write(os.path.join('posts', 'media', 'image.png'),
+                                'not really an image')
+        self.output = os.path.join(self.root, 'build', 'media', 'image.png')
+
+    def test_copied_once(self):
+        self.build()
+        self.assertEqual(self.read_output(os.path.join('media', 'image.png')),
+                         'not really an image')
+        inode = os.stat(self.output).st_ino
+        self.build()
+        self.assertEqual(os.stat(self.output).st_ino, inode)
+
+    def test_changed_media(self):
+        self.build()
+        self.write(os.path.join('posts', 'media', 'image.png'), 'an image')
+        self.build()
+        self.assertEqual(self.read_output(os.path.join('media', 'image.png')),
+                         'an image')
+
+    def test_deleted_media(self):
+        self.build()
+        os.remove(self.image)
+        self.build()
+        self.assertFalse(os.path.exists(self.output))
+        self.assertFalse(os.path.exists(os.path.dirname(self.output)))
+
+    def test_deleted_nested_directories(self):
+        self.write_post(os.path.join('a', 'b', 'x.md'), 'X', '2017-01-01')
+        self.write(os.path.join('posts', 'a', 'b', 'media', 'i.png'), 'i')
+        self.build()
+        shutil.rmtree(os.path.join(self.root, 'posts', 'a'))
+        self.build()
+        self.assertFalse(os.path.exists(
+            os.path.join(self.root, 'build', 'a')))
+
+    def test_copies_replaced_with_links(self):
+        self.build()
+        self.assertFalse(os.path.samefile(self.image, self.output))
+        generator = self.build(link_media=True)
+        self.assertTrue(os.path.samefile(self.image, self.output))
+        self.assertEqual(generator.changes['modified'],
+                         [os.path.join('media', 'image.png')])
+
+    def test_copied_once_when_links_fail(self):
+        def link(source, destination):
+            raise OSError(errno.EXDEV, 'Invalid cross-device link')
+
+        with mock.patch('os.link', link):
+            generator = self.build(link_media=True)
+            self.assertIn(os.path.join('media', 'image.png'),
+                          generator.changes['added'])
+            for _ in range(2):
+                generator = self.build(link_media=True)
+                self.assertEqual(generator.changes['modified'], [])
+        self.assertEqual(self.read_output(os.path.join('media', 'image.png')),
+                         'not really an image')
+
+    def test_linked_media(self):
+        self.build(link_media=True)
+        self.assertTrue(os.path.samefile(self.image, self.output))
+        # an editor replacing the source breaks the link, copying the new
+        # source never writes through the link into the old one
+        old_image = f'{self.image}.old'
+        os.rename(self.image, old_image)
+        self.write(os.path.join('posts', 'media', 'image.png'), 'an image')
+        self.build()
+        self.assertFalse(os.path.samefile(self.image, self.output))
+        self.assertEqual(self.read_output(os.path.join('media', 'image.png')),
+                         'an image')
+        with open(old_image) as f:
+            self.assertEqual(f.read(), 'not really an image')
+
+
+class CompressionTests(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write_post('first.md', 'First', '2017-01-01')
+        self.write_post('second.md', 'Second', '2017-01-02')
+        self.write(os.path.join('posts', 'media', 'style.css'), 'a {}')
+        self.write(os.path.join('posts', 'media', 'image.png'), 'image')
+
+    def test_compressed_copies(self):
+        generator = self.build(precompress=True)
+        self.assertEqual(sorted(name for name in generator.changes['added']
+                                if name.endswith('.gz')),
+                         ['archive.html.gz', 'feed.atom.gz', 'first.html.gz',
+                          'index.html.gz', os.path.join('media',
+                                                        'style.css.gz'),
+                          'second.html.gz'])
+        with gzip.open(os.path.join(self.root, 'build', 'first.html.gz'),
+                       'rt') as f:
+            self.assertEqual(f.read(), self.read_output('first.html'))
+
+    def test_only_changed_outputs_compressed(self):
+        self.build(precompress=True)
+        self.write_post('first.md', 'First', '2017-01-01',
+                        body='some text\n\nnew text')
+        generator = self.build(generator_class=CompressionCounter,
+                               precompress=True)
+        # the feed includes the post's body
+        self.assertEqual(sorted(generator.compressed),
+                         ['./first.html', 'feed.atom'])
+
+    def test_removed_with_output(self):
+        self.build(precompress=True)
+        generator = self.build()
+        self.assertIn('first.html.gz', generator.changes['deleted'])
+        self.assertFalse(os.path.exists(
+            os.path.join(self.root, 'build', 'first.html.gz')))
+
+
+class CompressionCounter(StaticGenerator):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.compressed = []
+
+    def compress_output(self, output):
+        self.compressed.append(output)
+        return super().compress_output(output)
+
+
+class FingerprintTests(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write_post(os.path.join('2018', 'photo.md'), 'Photo',
+                        '2018-01-01', body='![photo](media/photo.png)')
+        self.write(os.path.join('posts', '2018', 'media', 'photo.png'),
+                   'not really a photo')
+        self.write(os.path.join('posts', 'media', 'style.css'), 'a {}')
+        self.write(os.path.join('templates', 'post.html'),
+                   '{% asset media/style.css %}\n{{ post.body }}')
+
+    def fingerprinted(self):
+        with open(os.path.join(self.root, 'build', 'assets.json')) as f:
+            return json.load(f)
+
+    def test_fingerprinted(self):
+        self.build(fingerprint_media=True)
+        assets = self.fingerprinted()
+        photo = assets['2018/media/photo.png']
+        style = assets['media/style.css']
+        self.assertRegex(photo, r'^2018/media/photo\.[0-9a-f]{10}\.png$')
+        self.assertEqual(self.read_output(photo), 'not really a photo')
+        self.assertFalse(os.path.exists(
+            os.path.join(self.root, 'build', '2018', 'media', 'photo.png')))
+        page = self.read_output(os.path.join('2018', 'photo.html'))
+        self.assertEqual(page.split('\n')[0], style)
+        self.assertIn(f'src="{os.path.relpath(photo, "2018")}"', page)
+        self.assertIn(os.path.relpath(photo, '2018'),
+                      self.read_output('feed.atom'))
+
+    def test_changed_media(self):
+        self.build(fingerprint_media=True)
+        old_photo = self.fingerprinted()['2018/media/photo.png']
+        self.write(os.path.join('posts', '2018', 'media', 'photo.png'),
+                   'a photo')
+        generator = self.build(fingerprint_media=True)
+        new_photo = self.fingerprinted()['2018/media/photo.png']
+        self.assertNotEqual(old_photo, new_photo)
+        self.assertIn(new_photo, generator.changes['added'])
+        self.assertIn(old_photo, generator.changes['deleted'])
+        self.assertIn(os.path.relpath(new_photo, '2018'), self.read_output(
+            os.path.join('2018', 'photo.html')))
+
+    def test_only_pages_referring_to_media_rewritten(self):
+        self.write(os.path.join('templates', 'post.html'), '{{ post.body }}')
+        self.write_post('other.md', 'Other', '2017-01-01')
+        self.build(fingerprint_media=True)
+        self.write(os.path.join('posts', 'media', 'unrelated.png'), 'new')
+        generator = self.build(fingerprint_media=True)
+        self.assertEqual(generator.rendered, [])
+
+        self.write(os.path.join('posts', '2018', 'media', 'photo.png'),
+                   'a photo')
+        generator = self.build(fingerprint_media=True)
+        self.assertEqual(generator.rendered.count('post.html'), 1)
+        photo = os.path.relpath(
+            self.fingerprinted()['2018/media/photo.png'], '2018')
+        self.assertIn(photo, self.read_output(
+            os.path.join('2018', 'photo.html')))
+        # along with its leader, on the index
+        self.assertIn(photo, self.read_output('index.html'))
+
+    def test_asset_template_rewritten(self):
+        self.build(fingerprint_media=True)
+        self.write(os.path.join('posts', 'media', 'style.css'), 'b {}')
+        generator = self.build(fingerprint_media=True)
+        self.assertEqual(generator.rendered, ['post.html'])
+        self.assertEqual(self.read_output(os.path.join('2018', 'photo.html'))
+                         .split('\n')[0],
+                         self.fingerprinted()['media/style.css'])
+
+    def test_unfingerprinted(self):
+        self.build()
+        self.assertEqual(self.read_output(os.path.join('2018', 'photo.html')),
+                         'media/style.css\n'
+                         '<p><img src="media/photo.png" alt="photo"></p>\n')
+
+
+class FailureTests(SiteTestCase):
+
+    def test_failures_reported_per_file(self):
+        self.write_post('first.md', 'First', '2017-01-01')
+        self.write_post('second.md', 'Second', '2017-01-02')
+        # a directory where the page for "first" should go
+        os.makedirs(os.path.join(self.root, 'build', 'first.html'))
+        with self.assertLogs('quiescent.static', level='ERROR') as logs:
+            generator = self.build(io_threads=2)
+        self.assertEqual([name for name, _ in generator.failures],
+                         ['./first.html'])
+        self.assertIn('Failed to write ./first.html', logs.output[0])
+        self.assertIn('Second', self.read_output('second.html'))
+        self.assertEqual(self.read_output('archive.html'),
+                         './second.html\n./first.html\n')
+
+        # the page is retried by the next build
+        os.rmdir(os.path.join(self.root, 'build', 'first.html'))
+        generator = self.build()
+        self.assertEqual(generator.failures, [])
+        self.assertIn('First', self.read_output('first.html'))
+
+
+class ChangesTests(SiteTestCase):
+
+    def test_changes(self):
+        self.write_post('first.md', 'First', '2017-01-01')
+        self.write_post('second.md', 'Second', '2017-01-02')
+        self.write(os.path.join('posts', 'media', 'image.png'), 'image')
+        generator = self.build()
+        self.assertEqual(sorted(generator.changes['added']),
+                         ['archive.html', 'feed.atom', 'first.html',
+                          'index.html', 'media/image.png', 'second.html'])
+
+        self.write_post('first.md', 'First', '2017-01-01', body='new')
+        os.remove(os.path.join(self.root, 'posts', 'second.md'))
+        generator = self.build()
+        changes_file = os.path.join(self.root, 'changes.json')
+        generator.write_changes(changes_file)
+        with open(changes_file) as f:
+            self.assertEqual(json.load(f), {
+                'added': [],
+                'modified': ['archive.html', 'feed.atom', 'first.html',
+                             'index.html'],
+                'deleted': ['second.html']})
+
+        files_from = os.path.join(self.root, 'changes.txt')
+        generator.write_changes(files_from, format='files-from')
+        with open(files_from) as f:
+            self.assertEqual(f.read(), 'archive.html\nfeed.atom\n'
+                                       'first.html\nindex.html\n')
@@ -24,8 +24,12 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import io
+import os
 import re
-from quiescent.templite import Templite, TempliteSyntaxError
+import tempfile
+from quiescent.templite import (Templite, TempliteSyntaxError, TemplateLoader,
+                                BytecodeCache, tokenize)
 from unittest import TestCase
 
 
@@ -94,6 +98,24 @@ class TempliteTest(TestCase):
         obj2 = AnyOldObject(obj=obj, b="Bee")
         self.try_render("{{obj2.obj.a}} {{obj2.b}}", locals(), "Ay Bee")
 
+    def test_record_attributes(self):
+        # Attributes of records are looked up directly, anything else falls
+        # back to the general lookup.
+        class Record(AnyOldObject):
+            pass
+        template = Templite("{{obj.a}} {{obj.b.upper}} {{d.a}}",
+                            records=[Record])
+        obj = Record(a="Ay", b="bee")
+        self.assertEqual(template.render({'obj': obj, 'd': {'a': 17}}),
+                         "Ay BEE 17")
+        obj = AnyOldObject(a="Ay", b="bee")
+        self.assertEqual(template.render({'obj': obj, 'd': {'a': 17}}),
+                         "Ay BEE 17")
+
+    def test_non_identifier_attributes(self):
+        self.try_render("{{d.1}} {{d.class}}", {'d': {'1': 'one', 'class': 'c'}},
+                        "one c")
+
     def test_member_function(self):
         # Variables' member functions can be used, as long as they are nullary.
         class WithMemberFns(AnyOldObject):
@@ -228,6 +250,15 @@ class TempliteTest(TestCase):
                 "Hey {{foo.bar.baz}} there", {'foo': None}, "Hey ??? there"
             )
 
+    def test_render_to(self):
+        template = Templite("{% for n in nums %}{{n}}, {% endfor %}done.")
+        out = io.StringIO()
+        template.render_to(out, {'nums': [1, 2, 3]})
+        self.assertEqual(out.getvalue(), "1, 2, 3, done.")
+        pieces = []
+        template.render_to(pieces.append, {'nums': [1, 2]})
+        self.assertEqual(pieces, ['1', ', ', '2', ', ', 'done.'])
+
     def test_bad_names(self):
         with self.assertSynErr("Invalid name: var%&!@"):
             self.try_render("Wat: {{ var%&!@ }}")
@@ -262,8 +293,188 @@ class TempliteTest(TestCase):
         with self.assertSynErr("Bad syntax:\n\t{% endif %}"):
             self.try_render("{% if x %}{% endif %}{% endif %}")
 
+    def test_asset(self):
+        self.try_render('<img src="{% asset media/a.png %}">',
+                        {'asset': lambda path: path.upper()},
+                        '<img src="MEDIA/A.PNG">')
+        with self.assertSynErr("Bad syntax:\n\t{% asset %}"):
+            self.try_render("{% asset %}")
+
     def test_malformed_end(self):
         with self.assertSynErr("Bad syntax:\n\t{% end if %}"):
             self.try_render("{% if x %}X{% end if %}")
         with self.assertSynErr("Bad syntax:\n\t{% endif now %}"):
             self.try_render("{% if x %}X{% endif now %}")
+
+
+class TemplateLoaderTest(TestCase):
+    """Tests for loading templates from a directory."""
+
+    def setUp(self):
+        self._tempdir = tempfile.TemporaryDirectory()
+        self.directory = self._tempdir.name
+        self.loader = TemplateLoader(self.directory)
+
+    def tearDown(self):
+        self._tempdir.cleanup()
+
+    def write(self, name, text, mtime_ns=None):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        if mtime_ns is not None:
+            os.utime(path, ns=(mtime_ns, mtime_ns))
+
+    def test_compiled_once(self):
+        self.write('page.html', 'Hello, {{name}}!')
+        template = self.loader.get('page.html')
+        self.assertIs(self.loader.get('page.html'), template)
+        self.assertEqual(template.render({'name': 'Foo'}), 'Hello, Foo!')
+
+    def test_modified_template(self):
+        self.write('page.html', 'Hello, {{name}}!', mtime_ns=10**9)
+        template = self.loader.get('page.html')
+        self.write('page.html', 'Bye, {{name}}!', mtime_ns=2 * 10**9)
+        self.assertIsNot(self.loader.get('page.html'), template)
+        self.assertEqual(self.loader.get('page.html').render({'name': 'Foo'}),
+                         'Bye, Foo!')
+
+    def test_uses_action(self):
+        self.write('base.html',
+                   '{% asset style.css %}{% block x %}{% endblock %}')
+        self.write('page.html', '{% extends "base.html" %}'
+                   '{% block x %}{{name}}{% endblock %}')
+        self.write('plain.html', '{% if name %}{{name}}{% endif %}')
+        self.assertTrue(self.loader.uses_action('page.html', 'asset'))
+        self.assertFalse(self.loader.uses_action('plain.html', 'asset'))
+
+    def test_bytecode_cache(self):
+        self.write('page.html', 'Hello, {{name}}!')
+        cache = BytecodeCache(os.path.join(self.directory, 'cache'))
+        TemplateLoader(self.directory, bytecode_cache=cache).get('page.html')
+        key = cache.key('Hello, {{name}}!')
+        self.assertIsNotNone(cache.load(key))
+        self.assertIsNone(cache.load(cache.key('Bye, {{name}}!')))
+
+        # a fresh loader renders from the cached code
+        loader = TemplateLoader(self.directory, bytecode_cache=cache)
+        cache.dump(key, ((), Templite('Cached, {{name}}!').code))
+        self.assertEqual(loader.get('page.html').render({'name': 'Foo'}),
+                         'Cached, Foo!')
+
+    def test_modified_parent(self):
+        self.write('base.html', '<{% block x %}{% endblock %}>', 10**9)
+        self.write('page.html', '{% extends "base.html" %}'
+                   '{% block x %}{{name}}{% endblock %}')
+        self.assertEqual(self.loader.get('page.html').render({'name': 'Foo'}),
+                         '<Foo>')
+        self.assertEqual(self.loader.dependencies('page.html'),
+                         ['page.html', 'base.html'])
+        self.write('base.html', '[{% block x %}{% endblock %}]', 2 * 10**9)
+        self.assertEqual(self.loader.get('page.html').render({'name': 'Foo'}),
+                         '[Foo]')
+
+    def test_bytecode_cache_modified_parent(self):
+        cache = BytecodeCache(os.path.join(self.directory, 'cache'))
+        self.write('base.html', '<{% block x %}{% endblock %}>')
+        self.write('page.html', '{% extends "base.html" %}'
+                   '{% block x %}{{name}}{% endblock %}')
+        TemplateLoader(self.directory, bytecode_cache=cache).get('page.html')
+        self.write('base.html', '[{% block x %}{% endblock %}]')
+        loader = TemplateLoader(self.directory, bytecode_cache=cache)
+        self.assertEqual(loader.get('page.html').render({'name': 'Foo'}),
+                         '[Foo]')
+
+
+    def test_bytecode_cache_pruned(self):
+        cache = BytecodeCache(os.path.join(self.directory, 'cache'))
+        self.write('page.html', 'Hello, {{name}}!', mtime_ns=10**9)
+        self.write('other.html', 'Other')
+        loader = TemplateLoader(self.directory, bytecode_cache=cache)
+        loader.get('page.html')
+        loader.get('other.html')
+        self.write('page.html', 'Bye, {{name}}!', mtime_ns=2 * 10**9)
+        loader.get('page.html')
+        os.remove(os.path.join(self.directory, 'other.html'))
+        loader.prune_cache()
+        self.assertEqual(os.listdir(os.path.join(self.directory, 'cache')),
+                         [f"{cache.key('Bye, {{name}}!')}.cache"])
+
+
+class InheritanceTest(TestCase):
+    """Tests for {% extends %} and {% block %}, resolved at compile time."""
+
+    class DictLoader:
+        def __init__(self, templates):
+            self.templates = templates
+
+        def tokens(self, name):
+            return tokenize(self.templates[name])
+
+    def try_render(self, text, templates, ctx=None, result=None):
+        loader = self.DictLoader(templates)
+        actual = Templite(text, loader=loader).render(ctx or {})
+        if result is not None:
+            self.assertEqual(actual, result)
+
+    def assertSynErr(self, msg):
+        pat = "^" + re.escape(msg) + "$"
+        return self.assertRaisesRegex(TempliteSyntaxError, pat)
+
+    def test_default_blocks(self):
+        self.try_render("<{% block a %}A{% endblock %}>", {}, result="<A>")
+
+    def test_override(self):
+        base = "<{% block a %}A{% endblock %}|{% block b %}B{% endblock %}>"
+        self.try_render(
+            '{% extends "base.html" %}outside{% block b %}{{x}}{% endblock %}',
+            {'base.html': base}, {'x': 'X'}, "<A|X>")
+
+    def test_nested_blocks(self):
+        base = "{% block outer %}({% block inner %}i{% endblock %}){% endblock %}"
+        self.try_render('{% extends "base" %}{% block inner %}I{% endblock %}',
+                        {'base': base}, result="(I)")
+        self.try_render('{% extends "base" %}{% block outer %}O{% endblock %}',
+                        {'base': base}, result="O")
+
+    def test_multiple_levels(self):
+        templates = {
+            'base': "[{% block a %}{% endblock %}{% block b %}{% endblock %}]",
+            'middle': '{% extends "base" %}{% block a %}m{% endblock %}'
+                      '{% block b %}m{% endblock %}',
+        }
+        self.try_render('{% extends "middle" %}{% block b %}c{% endblock %}',
+                        templates, result="[mc]")
+
+    def test_loops_in_blocks(self):
+        base = "{% block a %}{% endblock %}!"
+        self.try_render(
+            '{% extends "base" %}'
+            '{% block a %}{% for n in nums %}{{n}}{% endfor %}{% endblock %}',
+            {'base': base}, {'nums': [1, 2, 3]}, "123!")
+
+    def test_dependencies(self):
+        templates = {'base': "", 'middle': '{% extends "base" %}'}
+        template = Templite('{% extends "middle" %}',
+                            loader=self.DictLoader(templates))
+        self.assertEqual(template.dependencies, ['middle', 'base'])
+
+    def test_no_loader(self):
+        with self.assertSynErr("Bad syntax, no loader to extend:\n\tbase"):
+            Templite('{% extends "base" %}')
+
+    def test_circular_extends(self):
+        templates = {'a': '{% extends "b" %}', 'b': '{% extends "a" %}'}
+        with self.assertSynErr("Bad syntax, circular extends:\n\tb"):
+            self.try_render('{% extends "b" %}', templates)
+
+    def test_malformed_blocks(self):
+        with self.assertSynErr("Bad syntax, unmatched action:\n\tblock"):
+            self.try_render("{% block a %}", {})
+        with self.assertSynErr("Bad syntax:\n\t{% block %}"):
+            self.try_render("{% block %}{% endblock %}", {})
+        with self.assertSynErr("Bad syntax:\n\t{% endblock %}"):
+            self.try_render("{% endblock %}", {})
+        with self.assertSynErr("Bad syntax, duplicate block:\n\ta"):
+            self.try_render("{% block a %}{% endblock %}"
+                            "{% block a %}{% endblock %}", {})
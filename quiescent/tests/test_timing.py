@@ -0,0 +1,54 @@
+# Copyright 2018 Nolan Prescott
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+from quiescent.timing import Timings
+from quiescent.tests.test_static import SiteTestCase
+
+
+class TimingsTests(unittest.TestCase):
+
+    def test_report(self):
+        timings = Timings()
+        with timings.phase('build'):
+            with timings.phase('posts'):
+                pass
+        for seconds, name in ((0.5, 'a.md'), (2.0, 'b.md'), (1.0, 'c.md')):
+            timings.record('posts parsed', name, seconds)
+        self.assertEqual([(name, depth) for name, depth, _ in timings.phases],
+                         [('build', 0), ('posts', 1)])
+        lines = timings.report(top=2).split('\n')
+        self.assertTrue(lines[2].startswith('    posts'))
+        self.assertEqual(lines[-3:],
+                         ['Slowest posts parsed (3 in total, 3.500s):',
+                          '      2.000s  b.md',
+                          '      1.000s  c.md'])
+
+
+class BuildTimingsTests(SiteTestCase):
+
+    def test_build_timed(self):
+        self.write_post('first.md', 'First', '2017-01-01')
+        generator = self.build(timings=Timings())
+        phases = [name for name, _, _ in generator.timings.phases]
+        for phase in ('process_posts', 'write_post_pages', 'write_feed',
+                      'copy_media'):
+            self.assertIn(phase, phases)
+        items = generator.timings.items
+        self.assertEqual([name for _, name in items['write_post_page']],
+                         ['./first.html'])
+        self.assertIn('index.html', [name for _, name
+                                     in items['template loads']])
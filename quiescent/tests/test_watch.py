@@ -0,0 +1,102 @@
+# Copyright 2018 Nolan Prescott
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+
+from quiescent.tests.test_static import SiteTestCase, CountingGenerator
+from quiescent.watch import Watcher, snapshot
+
+
+class WatcherTests(SiteTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.write_post('first.md', 'First', '2017-01-01')
+        self.write_post('second.md', 'Second', '2017-01-02')
+        self.generator = CountingGenerator(config_file=self.config_file)
+        self.generator.configure()
+        self.watcher = Watcher(self.generator)
+        self.assertTrue(self.watcher.check())
+        self.generator.rendered.clear()
+
+    def test_no_changes(self):
+        self.assertFalse(self.watcher.check())
+
+    def test_post_body_changed(self):
+        self.write_post('first.md', 'First', '2017-01-01',
+                        body='some text\n\nand more')
+        self.assertTrue(self.watcher.check())
+        self.assertEqual(self.generator.rendered, ['post.html'])
+        self.assertIn('and more', self.read_output('first.html'))
+
+    def test_post_title_changed(self):
+        self.write_post('first.md', 'Renamed', '2017-01-01')
+        self.assertTrue(self.watcher.check())
+        self.assertEqual(sorted(self.generator.rendered),
+                         ['archive.html', 'index.html', 'post.html'])
+        self.assertFalse(os.path.exists(
+            os.path.join(self.root, 'build', 'first.html')))
+        self.assertIn('Renamed', self.read_output('renamed.html'))
+
+    def test_post_template_changed(self):
+        self.write(os.path.join('templates', 'post.html'), '{{ post.date }}')
+        self.assertTrue(self.watcher.check())
+        self.assertEqual(self.generator.rendered, ['post.html', 'post.html'])
+
+    def test_failed_build_keeps_watching(self):
+        self.write(os.path.join('templates', 'post.html'), '{% if %}')
+        with self.assertLogs('quiescent.watch', level='ERROR'):
+            self.assertTrue(self.watcher.check())
+        self.write(os.path.join('templates', 'post.html'), 'fixed')
+        self.assertTrue(self.watcher.check())
+        self.assertEqual(self.read_output('first.html'), 'fixed')
+
+    def test_failed_configuration_keeps_watching(self):
+        with open(self.config_file) as f:
+            config = f.read()
+        with open(self.config_file, 'w') as f:
+            f.write(config + 'index posts = lots\n')
+        with self.assertLogs('quiescent.watch', level='ERROR'):
+            self.assertTrue(self.watcher.check())
+        self.assertEqual(self.generator.index_posts, 10)
+        self.assertFalse(self.watcher.check())
+
+        # retried when the configuration changes again
+        with open(self.config_file, 'w') as f:
+            f.write(config + 'index posts = 1\n')
+        self.assertTrue(self.watcher.check())
+        self.assertEqual(self.generator.index_posts, 1)
+
+    def test_symlinks_not_walked(self):
+        posts = os.path.join(self.root, 'posts')
+        os.symlink(posts, os.path.join(posts, 'up'))
+        os.symlink(os.path.join(posts, 'missing'),
+                   os.path.join(posts, 'dangling'))
+        self.assertFalse(self.watcher.check())
+        self.assertEqual(sorted(os.path.relpath(path, posts)
+                                for path in snapshot(posts)),
+                         ['first.md', 'second.md'])
+
+    def test_symlinked_media_watched(self):
+        shared = os.path.join(self.root, 'shared')
+        self.write(os.path.join('shared', 'image.png'), 'an image')
+        os.symlink(shared, os.path.join(self.root, 'posts', 'media'))
+        self.assertTrue(self.watcher.check())
+        self.assertEqual(self.read_output(os.path.join('media', 'image.png')),
+                         'an image')
+        self.write(os.path.join('shared', 'image.png'), 'another image')
+        self.assertTrue(self.watcher.check())
+        self.assertEqual(self.read_output(os.path.join('media', 'image.png')),
+                         'another image')
@@ -0,0 +1,68 @@
+# Copyright 2018 Nolan Prescott
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Timing a build, see `quiescent --profile`
+  - phases are the steps of a build (processing posts, writing pages, ...)
+    timed by wall-clock, phases may be nested
+  - items are the individual posts, pages and files within a phase, timed
+    where the work is done (including in worker processes)
+"""
+from collections import defaultdict
+import contextlib
+import time
+
+
+class Timings:
+    def __init__(self):
+        # (name, depth, seconds) in the order phases started
+        self.phases = []
+        # category -> [(seconds, name), ...]
+        self.items = defaultdict(list)
+        self._depth = 0
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        index = len(self.phases)
+        self.phases.append((name, self._depth, None))
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            self.phases[index] = (name, self._depth,
+                                  time.perf_counter() - start)
+
+    def record(self, category, name, seconds):
+        self.items[category].append((seconds, name))
+
+    def report(self, top=10):
+        '''
+        A plain text report of every phase and the `top` slowest items in
+        each category
+        '''
+        lines = ['Phases:']
+        for name, depth, seconds in self.phases:
+            label = '  ' * depth + name
+            lines.append(f'  {label:<40} {seconds:9.3f}s')
+        for category, items in sorted(self.items.items()):
+            total = sum(seconds for seconds, _ in items)
+            lines.append('')
+            lines.append(f'Slowest {category} ({len(items)} in total, '
+                         f'{total:.3f}s):')
+            for seconds, name in sorted(items, reverse=True)[:top]:
+                lines.append(f'  {seconds:9.3f}s  {name}')
+        return '\n'.join(lines)
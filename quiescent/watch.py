@@ -0,0 +1,140 @@
+# Copyright 2018 Nolan Prescott
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Rebuilding a site as its sources change
+  - the generator stays resident between builds, keeping its manifest,
+    posts and compiled templates in memory, each rebuild is an incremental
+    build (see `quiescent.manifest`) regenerating only what changed
+  - changes are found by polling the mtimes and sizes of the sources, which
+    needs nothing beyond the standard library and works on any filesystem
+"""
+import logging
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def snapshot(*paths, media_dir_name=None):
+    '''
+    Map every file in or under `paths` (files or directories) to its mtime
+    and size. Like `quiescent.scan`, symlinked directories aren't walked,
+    except for the files directly within one named `media_dir_name`.
+    '''
+    files = {}
+    # (path, is it a symlinked directory)
+    pending = [(path, False) for path in paths]
+    while pending:
+        path, is_link = pending.pop()
+        try:
+            if os.path.isdir(path):
+                with os.scandir(path) as it:
+                    entries = list(it)
+            else:
+                stat = os.stat(path)
+                files[path] = (stat.st_mtime_ns, stat.st_size)
+                continue
+        except OSError:
+            # deleted in between listing and looking at it, or unreadable
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if not is_link:
+                        pending.append((entry.path, False))
+                    continue
+                if entry.is_symlink() and entry.is_dir():
+                    if entry.name == media_dir_name and not is_link:
+                        pending.append((entry.path, True))
+                    continue
+                stat = entry.stat()
+            except OSError:
+                # a dangling or looping symlink, or deleted since
+                continue
+            files[entry.path] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+class Watcher:
+    def __init__(self, generator, interval=1.0, on_build=None):
+        '''
+        Args:
+            generator: a configured `StaticGenerator`
+            interval: seconds between checks for changes
+            on_build: called with the generator after every build
+        '''
+        self.generator = generator
+        self.interval = interval
+        self.on_build = on_build
+        self._snapshot = None
+        self._config_snapshot = None
+
+    def _snapshot_sources(self):
+        return snapshot(self.generator.posts_dir, self.generator.template_dir,
+                        media_dir_name=self.generator.media_dir)
+
+    def check(self):
+        '''
+        Rebuild if anything changed since the last check (or if this is the
+        first), returning whether a build was run
+        '''
+        config = snapshot(self.generator.config_file)
+        current = self._snapshot_sources()
+        if current == self._snapshot and config == self._config_snapshot:
+            return False
+        if (self._config_snapshot is not None
+                and config != self._config_snapshot):
+            logger.info('Configuration changed, reloading')
+            previous = dict(self.generator.__dict__)
+            try:
+                self.generator.configure()
+            except Exception as e:
+                # carry on with the previous configuration (configure may
+                # have got part way), and try again when the file changes
+                logger.error('Configuration failed, keeping the previous '
+                             f'configuration\n\t{e}')
+                self.generator.__dict__.clear()
+                self.generator.__dict__.update(previous)
+            current = self._snapshot_sources()
+        self._snapshot = current
+        self._config_snapshot = config
+        self.build()
+        return True
+
+    def build(self):
+        start = time.perf_counter()
+        try:
+            self.generator.build()
+        except Exception:
+            # keep watching, the next change may well fix it
+            logger.exception('Build failed')
+            return
+        changes = self.generator.changes
+        logger.info(f'Built in {time.perf_counter() - start:.2f}s: '
+                    f'{len(changes["added"])} added, '
+                    f'{len(changes["modified"])} modified, '
+                    f'{len(changes["deleted"])} deleted')
+        if self.on_build is not None:
+            self.on_build(self.generator)
+
+    def run(self):
+        logger.info('Watching for changes, press Ctrl-C to stop')
+        try:
+            while True:
+                self.check()
+                time.sleep(self.interval)
+        except KeyboardInterrupt:
+            pass
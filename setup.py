@@ -13,6 +13,7 @@ setup(name="quiescent",
       author_email='prescott.nolan@gmail.com',
       license='GPL',
       packages=['quiescent'],
+      python_requires='>=3.8',
       install_requires=[
           'mistune >= 0.7.3',
       ],
@@ -23,7 +24,10 @@ setup(name="quiescent",
       classifiers=[
           'License :: OSI Approved :: GNU General Public License v3 (GPLv3)',
           'Programming Language :: Python :: 3 :: Only',
-          'Programming Language :: Python :: 3.6',
+          'Programming Language :: Python :: 3.8',
+          'Programming Language :: Python :: 3.9',
+          'Programming Language :: Python :: 3.10',
+          'Programming Language :: Python :: 3.11',
           'Development Status :: 4 - Beta',
       ],
       zip_safe=False)